@@ -0,0 +1,170 @@
+import numpy as np
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Earthquake
+from .gazetteer import label_earthquakes
+
+# Accepted range of each numeric field (inclusive)
+VALID_RANGES = {
+    'latitude': (-90.0, 90.0),
+    'longitude': (-180.0, 180.0),
+    'depth': (-10.0, 1000.0),
+    'magnitude': (-3.0, 10.0),
+}
+
+BATCH_SIZE = 500
+
+# Helper: convert a JSON value to float, NaN if missing or not a number
+def to_float(value):
+    if isinstance(value, bool):
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+# Helper: parse an ISO 8601 string into a UTC datetime, None if invalid
+def to_datetime(value):
+    if not isinstance(value, str):
+        return None
+    try:
+        time = parse_datetime(value)
+    except ValueError:
+        return None
+    if time is None:
+        return None
+    if timezone.is_naive(time):
+        time = timezone.make_aware(time)
+    return time.astimezone(timezone.get_fixed_timezone(0))
+
+
+def validate_batch(items):
+    """
+    Validates a list of earthquake objects column by column.
+    Returns the valid rows as (index, time, latitude, longitude, depth, magnitude)
+    tuples and a dict of errors per invalid index.
+    """
+    errors = {}
+    is_object = np.fromiter((isinstance(item, dict) for item in items), dtype=bool, count=len(items))
+    for index in np.flatnonzero(~is_object).tolist():
+        errors[index] = {'non_field_errors': "Expected a JSON object."}
+
+    records = [item if isinstance(item, dict) else {} for item in items]
+
+    # Time
+    times = [to_datetime(record.get('time')) for record in records]
+    for index, time in enumerate(times):
+        if time is None and is_object[index]:
+            errors.setdefault(index, {})['time'] = "Expected an ISO 8601 datetime."
+
+    # Numeric fields, range checks on whole columns
+    columns = {}
+    for field, (low, high) in VALID_RANGES.items():
+        column = np.fromiter((to_float(record.get(field)) for record in records), dtype=np.float64, count=len(records))
+        columns[field] = column
+
+        missing = np.isnan(column) & is_object
+        out_of_range = ~np.isnan(column) & ((column < low) | (column > high))
+        for index in np.flatnonzero(missing).tolist():
+            errors.setdefault(index, {})[field] = "Missing or not a number."
+        for index in np.flatnonzero(out_of_range).tolist():
+            errors.setdefault(index, {})[field] = f"Must be between {low} and {high}."
+
+    valid = [index for index in range(len(items)) if index not in errors]
+    rows = [
+        (
+            index,
+            times[index],
+            float(columns['latitude'][index]),
+            float(columns['longitude'][index]),
+            float(columns['depth'][index]),
+            float(columns['magnitude'][index]),
+        )
+        for index in valid
+    ]
+    return rows, errors
+
+
+def stored_keys(times, using='default'):
+    """
+    Keys (time, latitude, longitude, depth, magnitude) already stored at the given times,
+    looked up in chunks.
+    """
+    times = sorted(set(times))
+    keys = set()
+    for i in range(0, len(times), BATCH_SIZE):
+        keys.update(
+            Earthquake.objects.using(using)
+            .filter(time__in=times[i:i + BATCH_SIZE])
+            .values_list('time', 'latitude', 'longitude', 'depth', 'magnitude')
+        )
+    return keys
+
+
+def insert_earthquakes(earthquakes, using='default'):
+    """
+    Inserts the earthquakes in chunks, each chunk in a savepoint.
+    If a chunk hits the unique constraint (a row committed by a concurrent request
+    after the lookup), its earthquakes are inserted one by one instead.
+    Returns the earthquakes that were not inserted.
+    """
+    rejected = []
+    for i in range(0, len(earthquakes), BATCH_SIZE):
+        chunk = earthquakes[i:i + BATCH_SIZE]
+        try:
+            with transaction.atomic(using=using):
+                Earthquake.objects.using(using).bulk_create(chunk)
+            continue
+        except IntegrityError:
+            pass
+
+        for earthquake in chunk:
+            try:
+                with transaction.atomic(using=using):
+                    earthquake.save(using=using, force_insert=True)
+            except IntegrityError:
+                earthquake.pk = None
+                rejected.append(earthquake)
+    return rejected
+
+
+def upsert_batch(rows, using='default'):
+    """
+    Inserts the valid rows in one transaction, skipping those already stored
+    (same time, latitude, longitude, depth and magnitude).
+    Returns a dict of "created" or "duplicate" per index.
+    """
+    statuses = {}
+
+    with transaction.atomic(using=using):
+        existing = stored_keys([row[1] for row in rows], using)
+
+        earthquakes = []
+        indices = []
+        for index, *key in rows:
+            key = tuple(key)
+            if key in existing:
+                statuses[index] = "duplicate"
+                continue
+            existing.add(key)
+            time, latitude, longitude, depth, magnitude = key
+            earthquakes.append(
+                Earthquake(
+                    time=time,
+                    latitude=latitude,
+                    longitude=longitude,
+                    depth=depth,
+                    magnitude=magnitude
+                )
+            )
+            indices.append(index)
+
+        label_earthquakes(earthquakes)
+        rejected = {id(earthquake) for earthquake in insert_earthquakes(earthquakes, using)}
+
+        # Only rows actually inserted are reported as created
+        for index, earthquake in zip(indices, earthquakes):
+            statuses[index] = "duplicate" if id(earthquake) in rejected else "created"
+
+    return statuses
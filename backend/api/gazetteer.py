@@ -0,0 +1,179 @@
+"""
+Nearest place lookup against a local gazetteer file.
+
+Places are indexed once per process in a 3D grid over unit vectors, with cells as
+large as the maximum search distance, so each earthquake only needs to be compared
+with the places of its own cell and the 26 around it.
+"""
+import csv
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def to_unit_vectors(latitude, longitude):
+    lat = np.radians(np.asarray(latitude, dtype=np.float64))
+    lon = np.radians(np.asarray(longitude, dtype=np.float64))
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def chord_for_km(distance):
+    return 2 * math.sin(min(distance / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def km_for_chord(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+def load_places(path):
+    """
+    Reads a gazetteer file into (names, latitudes, longitudes).
+    - CSV with name, latitude, longitude columns
+    - GeoJSON with a "name" property; Points are used as is, Polygons and
+      MultiPolygons by the mean of their outer ring vertices
+    """
+    path = Path(path)
+    names, latitudes, longitudes = [], [], []
+
+    if path.suffix.lower() in ('.json', '.geojson'):
+        with open(path, encoding='utf-8') as f:
+            features = json.load(f).get('features', [])
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            name = (feature.get('properties') or {}).get('name')
+            if geometry.get('type') == 'Point':
+                points = [geometry['coordinates']]
+            elif geometry.get('type') == 'Polygon':
+                points = geometry['coordinates'][0][:-1]
+            elif geometry.get('type') == 'MultiPolygon':
+                points = [point for polygon in geometry['coordinates'] for point in polygon[0][:-1]]
+            else:
+                continue
+            if not name or not points:
+                continue
+            names.append(name)
+            longitudes.append(sum(point[0] for point in points) / len(points))
+            latitudes.append(sum(point[1] for point in points) / len(points))
+    else:
+        with open(path, encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            # Normalize column names (headers may have spaces)
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+            for row in reader:
+                names.append(row['name'].strip())
+                latitudes.append(float(row['latitude']))
+                longitudes.append(float(row['longitude']))
+
+    return names, latitudes, longitudes
+
+
+class Gazetteer:
+    """
+    Grid index of places for nearest place lookups within max_distance km.
+    """
+
+    def __init__(self, names, latitudes, longitudes, max_distance):
+        self.names = np.array(names, dtype=object)
+        self.points = to_unit_vectors(latitudes, longitudes)
+        self.max_chord = chord_for_km(max_distance)
+
+        self.cells = {}
+        keys = np.floor(self.points / self.max_chord).astype(np.int64)
+        for index, key in enumerate(map(tuple, keys.tolist())):
+            self.cells.setdefault(key, []).append(index)
+        self.cells = {key: np.array(indices, dtype=np.intp) for key, indices in self.cells.items()}
+
+    @classmethod
+    def from_file(cls, path, max_distance):
+        return cls(*load_places(path), max_distance)
+
+    def candidates(self, key):
+        found = [
+            self.cells[neighbour]
+            for neighbour in (
+                (key[0] + dx, key[1] + dy, key[2] + dz)
+                for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+            )
+            if neighbour in self.cells
+        ]
+        return np.concatenate(found) if found else None
+
+    def nearest(self, latitudes, longitudes):
+        """
+        Labels a batch of coordinates.
+        Returns a list of (place, distance in km), ("", None) where nothing is within range.
+        """
+        points = to_unit_vectors(latitudes, longitudes)
+        places = np.full(len(points), "", dtype=object)
+        distances = np.full(len(points), np.nan)
+
+        # Earthquakes in the same cell share the same candidate places
+        keys = np.floor(points / self.max_chord).astype(np.int64)
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        # Indices of the earthquakes sorted by group, split at the group boundaries
+        order = np.argsort(inverse.ravel(), kind='stable')
+        groups = np.split(order, np.cumsum(np.bincount(inverse.ravel(), minlength=len(unique_keys)))[:-1])
+        for key, members in zip(map(tuple, unique_keys.tolist()), groups):
+            candidates = self.candidates(key)
+            if candidates is None:
+                continue
+            chords = np.linalg.norm(points[members, None, :] - self.points[None, candidates, :], axis=2)
+            best = chords.argmin(axis=1)
+            best_chord = chords[np.arange(len(members)), best]
+            in_range = best_chord <= self.max_chord
+
+            places[members[in_range]] = self.names[candidates[best[in_range]]]
+            distances[members[in_range]] = km_for_chord(best_chord[in_range])
+
+        return [
+            (place, round(float(distance), 1) if not np.isnan(distance) else None)
+            for place, distance in zip(places.tolist(), distances.tolist())
+        ]
+
+    def label(self, earthquakes):
+        """
+        Sets place and place_distance on Earthquake instances (not saved).
+        """
+        if not earthquakes:
+            return earthquakes
+        labels = self.nearest(
+            [earthquake.latitude for earthquake in earthquakes],
+            [earthquake.longitude for earthquake in earthquakes],
+        )
+        for earthquake, (place, distance) in zip(earthquakes, labels):
+            earthquake.place = place
+            earthquake.place_distance = distance
+        return earthquakes
+
+
+GAZETTEERS = {}
+
+
+def get_gazetteer():
+    """
+    The gazetteer configured by GAZETTEER_PATH, loaded once per process.
+    Returns None if enrichment is not configured.
+    """
+    path = getattr(settings, 'GAZETTEER_PATH', '')
+    if not path:
+        return None
+    max_distance = getattr(settings, 'GAZETTEER_MAX_DISTANCE_KM', 50)
+    key = (str(path), max_distance)
+    if key not in GAZETTEERS:
+        GAZETTEERS[key] = Gazetteer.from_file(path, max_distance)
+    return GAZETTEERS[key]
+
+
+def label_earthquakes(earthquakes):
+    """
+    Sets place and place_distance on Earthquake instances if a gazetteer is configured.
+    """
+    gazetteer = get_gazetteer()
+    if gazetteer is not None:
+        gazetteer.label(earthquakes)
+    return earthquakes
@@ -0,0 +1,324 @@
+"""
+In-memory rolling window of the most recent earthquakes.
+
+With no date filters every dashboard load asks for the last 24 hours, so those
+events are kept in process as NumPy columns. The list and stats endpoints answer
+from here whenever the requested filters fall entirely inside the window.
+"""
+import threading
+import time as monotonic_time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Earthquake
+from .utils import parse_filters
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+FIELDS = ('id', 'time', 'latitude', 'longitude', 'depth', 'magnitude', 'place', 'place_distance')
+
+# Comparison used for each lookup type
+OPERATORS = {
+    'gte': np.greater_equal,
+    'lte': np.less_equal,
+    'lt': np.less,
+    'exact': np.equal,
+}
+
+
+def to_micros(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(value):
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+class EarthquakeRecord:
+    """
+    Lightweight stand-in for an Earthquake instance, accepted by EarthquakeSerializer.
+    """
+    __slots__ = ('id', 'time', 'latitude', 'longitude', 'depth', 'magnitude', 'place', 'place_distance')
+
+    def __init__(self, id, time, latitude, longitude, depth, magnitude, place, place_distance):
+        self.id = id
+        self.time = time
+        self.latitude = latitude
+        self.longitude = longitude
+        self.depth = depth
+        self.magnitude = magnitude
+        self.place = place
+        self.place_distance = place_distance
+
+
+class EarthquakeColumns:
+    """
+    Columnar storage of earthquakes, ordered like the model (latest first).
+    Times are stored as microseconds since the epoch (UTC), a missing place_distance as NaN.
+    """
+    __slots__ = ('id', 'time', 'latitude', 'longitude', 'depth', 'magnitude', 'place', 'place_distance')
+
+    def __init__(self, id, time, latitude, longitude, depth, magnitude, place, place_distance):
+        order = np.lexsort((-id, -time))
+        self.id = id[order]
+        self.time = time[order]
+        self.latitude = latitude[order]
+        self.longitude = longitude[order]
+        self.depth = depth[order]
+        self.magnitude = magnitude[order]
+        self.place = place[order]
+        self.place_distance = place_distance[order]
+
+    @classmethod
+    def from_rows(cls, rows):
+        rows = list(rows)
+        return cls(
+            id=np.array([row[0] for row in rows], dtype=np.int64),
+            time=np.array([to_micros(row[1]) for row in rows], dtype=np.int64),
+            latitude=np.array([row[2] for row in rows], dtype=np.float64),
+            longitude=np.array([row[3] for row in rows], dtype=np.float64),
+            depth=np.array([row[4] for row in rows], dtype=np.float64),
+            magnitude=np.array([row[5] for row in rows], dtype=np.float64),
+            place=np.array([row[6] for row in rows], dtype=object),
+            place_distance=np.array([np.nan if row[7] is None else row[7] for row in rows], dtype=np.float64),
+        )
+
+    def __len__(self):
+        return len(self.id)
+
+    def take(self, mask):
+        return EarthquakeColumns(*(getattr(self, name)[mask] for name in self.__slots__))
+
+    def extend(self, other):
+        return EarthquakeColumns(*(
+            np.concatenate((getattr(self, name), getattr(other, name))) for name in self.__slots__
+        ))
+
+    def records(self):
+        return [
+            EarthquakeRecord(
+                id, from_micros(time), latitude, longitude, depth, magnitude,
+                place, None if np.isnan(place_distance) else place_distance,
+            )
+            for id, time, latitude, longitude, depth, magnitude, place, place_distance in zip(
+                self.id.tolist(), self.time.tolist(), self.latitude.tolist(),
+                self.longitude.tolist(), self.depth.tolist(), self.magnitude.tolist(),
+                self.place.tolist(), self.place_distance.tolist(),
+            )
+        ]
+
+    def time_range(self):
+        # Rows are ordered latest first
+        return from_micros(self.time[-1]), from_micros(self.time[0])
+
+    def per_period(self, label):
+        """
+        Count, average and maximum magnitude per hour/day/month/year,
+        matching the Trunc* aggregation done by the database.
+        """
+        periods = [truncate(from_micros(time), label) for time in self.time.tolist()]
+        keys = sorted(set(periods))
+        index = {period: i for i, period in enumerate(keys)}
+        inverse = np.fromiter((index[period] for period in periods), dtype=np.intp, count=len(periods))
+
+        counts = np.bincount(inverse, minlength=len(keys))
+        sums = np.bincount(inverse, weights=self.magnitude, minlength=len(keys))
+        maxima = np.full(len(keys), -np.inf)
+        np.maximum.at(maxima, inverse, self.magnitude)
+
+        return [
+            {
+                "period": period,
+                "count": int(count),
+                "avg_magnitude": float(total) / int(count),
+                "max_magnitude": float(maximum),
+            }
+            for period, count, total, maximum in zip(keys, counts, sums, maxima)
+        ]
+
+
+def truncate(value, label):
+    value = timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+    if label == "hour":
+        return value
+    value = value.replace(hour=0)
+    if label == "day":
+        return value
+    value = value.replace(day=1)
+    if label == "month":
+        return value
+    return value.replace(month=1)
+
+
+class HotWindowStore:
+    """
+    Holds every earthquake with time >= start, where start is the moment of the last
+    (re)load minus HOT_WINDOW_HOURS.
+    - Loaded lazily on first use and fully reloaded every HOT_WINDOW_REFRESH_SECONDS,
+      which picks up updates and deletes made by other processes. One thread reloads
+      while the others keep serving the previous columns
+    - New rows, whoever wrote them (e.g. the fetch_earthquakes scheduled task, other
+      server workers, bulk inserts), are added on every use with an indexed id > max_id query
+    - Saves and deletes made in this process are applied immediately after commit
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.columns = None
+        self.start = None
+        self.loaded_at = None
+        self.max_id = 0
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'HOT_WINDOW_ENABLED', True)
+
+    def invalidate(self):
+        with self.lock:
+            self.columns = None
+
+    def stale(self):
+        refresh = getattr(settings, 'HOT_WINDOW_REFRESH_SECONDS', 60)
+        with self.lock:
+            return self.columns is None or monotonic_time.monotonic() - self.loaded_at > refresh
+
+    def reload(self, earliest=None):
+        hours = getattr(settings, 'HOT_WINDOW_HOURS', 24)
+        start = timezone.now() - timedelta(hours=hours)
+        # Also cover the request that triggered the reload (its bound was computed a bit earlier)
+        if earliest is not None:
+            start = min(start, earliest)
+        # Rows inserted after this are fetched again by catch_up, duplicates are dropped by id
+        max_id = Earthquake.objects.using('default').aggregate(max_id=Max('id'))['max_id'] or 0
+        rows = Earthquake.objects.using('default').filter(time__gte=start).values_list(*FIELDS)
+        columns = EarthquakeColumns.from_rows(rows)
+        start = to_micros(start)
+
+        with self.lock:
+            self.columns = columns
+            self.start = start
+            self.loaded_at = monotonic_time.monotonic()
+            self.max_id = max_id
+        return columns, start
+
+    def catch_up(self, max_id):
+        """
+        Adds the rows with id > max_id, e.g. inserted by another process.
+        """
+        rows = list(Earthquake.objects.using('default').filter(id__gt=max_id).values_list(*FIELDS))
+        if not rows:
+            return
+
+        with self.lock:
+            if self.columns is None:
+                return
+            new = EarthquakeColumns.from_rows(rows)
+            new = new.take(new.time >= self.start)
+            self.columns = self.columns.take(~np.isin(self.columns.id, new.id)).extend(new)
+            self.max_id = max(self.max_id, max(row[0] for row in rows))
+
+    def snapshot(self, earliest=None):
+        """
+        Returns the current (columns, start), reloading them if stale and otherwise
+        adding the rows inserted since the last look.
+        """
+        if self.stale():
+            with self.lock:
+                loaded = self.columns is not None
+            # Only wait for another thread's reload if there is nothing to serve meanwhile
+            if self.reload_lock.acquire(blocking=not loaded):
+                try:
+                    if self.stale():
+                        return self.reload(earliest)
+                finally:
+                    self.reload_lock.release()
+
+        with self.lock:
+            columns, start, max_id = self.columns, self.start, self.max_id
+        self.catch_up(max_id)
+        with self.lock:
+            if self.columns is None:
+                return columns, start
+            return self.columns, self.start
+
+    def upsert(self, instance):
+        with self.lock:
+            if self.columns is None:
+                return
+            columns = self.columns.take(self.columns.id != instance.pk)
+            time = to_micros(instance.time)
+            if time >= self.start:
+                columns = columns.extend(EarthquakeColumns.from_rows([(
+                    instance.pk, instance.time, instance.latitude, instance.longitude,
+                    instance.depth, instance.magnitude, instance.place, instance.place_distance,
+                )]))
+            self.columns = columns
+
+    def remove(self, pk):
+        with self.lock:
+            if self.columns is None:
+                return
+            self.columns = self.columns.take(self.columns.id != pk)
+
+    def select(self, params):
+        """
+        Returns the matching EarthquakeColumns, or None if the filters
+        cannot be answered from the window (the caller then uses the database).
+        """
+        if not self.enabled:
+            return None
+
+        # Taken before parsing so the default last-24h bound is never before it
+        horizon = timezone.now() - timedelta(hours=getattr(settings, 'HOT_WINDOW_HOURS', 24))
+        try:
+            lookups = parse_filters(params)
+        except ValueError:
+            return None
+        if lookups is None:
+            return None
+
+        # Translate a single-day filter into a time range
+        if 'time__date' in lookups:
+            day = lookups.pop('time__date')
+            lookups['time__gte'] = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+            lookups['time__lt'] = timezone.make_aware(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+
+        # Filters reaching before the window never touch it (no catch-up or reload query)
+        earliest = lookups['time__gte']
+        if earliest < horizon:
+            return None
+
+        columns, start = self.snapshot(earliest)
+        if columns is None or to_micros(earliest) < start:
+            return None
+
+        mask = np.ones(len(columns), dtype=bool)
+        for lookup, value in lookups.items():
+            field, _, operator = lookup.partition('__')
+            if field == 'time':
+                value = to_micros(value)
+            mask &= OPERATORS[operator or 'exact'](getattr(columns, field), value)
+
+        return columns.take(mask)
+
+
+hot_window = HotWindowStore()
+
+
+@receiver(post_save, sender=Earthquake)
+def earthquake_saved(sender, instance, using, **kwargs):
+    transaction.on_commit(lambda: hot_window.upsert(instance), using=using)
+
+
+@receiver(post_delete, sender=Earthquake)
+def earthquake_deleted(sender, instance, using, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: hot_window.remove(pk), using=using)
@@ -0,0 +1,284 @@
+"""
+Fetching of earthquake feeds and merging of events reported by several agencies.
+
+The same earthquake is usually reported by every agency with a slightly different
+time, location and magnitude. Reports are compared only with the events inside the
+time tolerance (sorted by time) that also pass a lat/lon box check.
+"""
+import math
+import re
+import time
+import xml.etree.ElementTree as ET
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+
+import requests
+from django.utils import timezone
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.2
+CHUNK_SIZE = 8192  # Bytes read between deadline checks when fetching a feed
+
+
+class Report:
+    """
+    One earthquake as reported by a single source.
+    """
+    __slots__ = ('source', 'priority', 'time', 'latitude', 'longitude', 'depth', 'magnitude')
+
+    def __init__(self, source, priority, time, latitude, longitude, depth, magnitude):
+        self.source = source
+        self.priority = priority
+        self.time = time
+        self.latitude = latitude
+        self.longitude = longitude
+        self.depth = depth
+        self.magnitude = magnitude
+
+
+class Cluster:
+    """
+    Reports (and possibly an already stored Earthquake) describing the same event.
+    The first member is the reference the next reports are compared with.
+    """
+    __slots__ = ('earthquake', 'reports', 'time', 'latitude', 'longitude', 'magnitude')
+
+    def __init__(self, member):
+        self.earthquake = None
+        self.reports = []
+        self.time = member.time
+        self.latitude = member.latitude
+        self.longitude = member.longitude
+        self.magnitude = member.magnitude
+
+    def sources(self):
+        return {report.source for report in self.reports}
+
+    def canonical(self):
+        # Values of the highest priority source (first configured)
+        return min(self.reports, key=lambda report: report.priority)
+
+
+def parse_feed(content, source, priority=0):
+    """
+    Parses the XML feed into Reports.
+    Returns the reports and the error messages of the entries that could not be parsed.
+    """
+    root = ET.fromstring(content)
+    reports = []
+    errors = []
+
+    for item in root.findall(".//item"):
+        desc = item.find("description").text
+
+        # Replace <br> with newlines so regex works line by line
+        cleaned_desc = desc.replace("<br>", "\n")
+
+        # Parse values from string using regex
+        try:
+            # Time
+            time_match = re.search(r"Time:\s*(\d{2}-[A-Za-z]{3}-\d{4} \d{2}:\d{2}:\d{2})", cleaned_desc)
+            # Latitude
+            lat_match = re.search(r"Latitude:\s*([\d.]+)N", cleaned_desc)
+            # Longitude
+            lon_match = re.search(r"Longitude:\s*([\d.]+)E", cleaned_desc)
+            # Depth
+            depth_match = re.search(r"Depth:\s*([\d.]+)km", cleaned_desc)
+            # Magnitude
+            mag_match = re.search(r"M\s*([\d.]+)", cleaned_desc)
+
+            if all([time_match, lat_match, lon_match, depth_match, mag_match]):
+                time_str = time_match.group(1)
+                time = timezone.make_aware(datetime.strptime(time_str, "%d-%b-%Y %H:%M:%S"))
+
+                reports.append(Report(
+                    source=source,
+                    priority=priority,
+                    time=time,
+                    latitude=float(lat_match.group(1)),
+                    longitude=float(lon_match.group(1)),
+                    depth=float(depth_match.group(1)),
+                    magnitude=float(mag_match.group(1)),
+                ))
+            else:
+                raise ValueError("Could not find all fields in the description.")
+
+        except Exception as e:
+            errors.append(f"Failed to parse entry: {e}")
+
+    return reports, errors
+
+
+def fetch_source(url, priority, timeout):
+    """
+    Fetches and parses one source, giving up once timeout seconds have passed in total
+    (the requests timeout alone only bounds the connect and each wait between bytes).
+    """
+    deadline = time.monotonic() + timeout
+    with requests.get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        content = bytearray()
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"No complete response within {timeout} s")
+            content.extend(chunk)
+    return parse_feed(bytes(content), url, priority)
+
+
+def fetch_sources(urls, timeout):
+    """
+    Fetches and parses all sources concurrently.
+    Returns (url, reports, errors) per source in the configured order;
+    a source that fails or times out has no reports and a single error.
+    """
+    if not urls:
+        return []
+
+    deadline = time.monotonic() + timeout
+    executor = ThreadPoolExecutor(max_workers=len(urls))
+    futures = [executor.submit(fetch_source, url, priority, timeout) for priority, url in enumerate(urls)]
+
+    results = []
+    for url, future in zip(urls, futures):
+        try:
+            reports, errors = future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            reports, errors = [], [f"Failed to fetch {url}: no complete response within {timeout} s"]
+        except Exception as e:
+            reports, errors = [], [f"Failed to fetch {url}: {e}"]
+        results.append((url, reports, errors))
+
+    # Don't wait for a source still sending, it stops at its own deadline
+    executor.shutdown(wait=False)
+    return results
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    # Haversine distance
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def within_tolerances(a, b, lat_box, distance_tolerance, magnitude_tolerance):
+    """
+    Returns the distance in km between a and b if they can be the same event, else None.
+    The lat/lon box check avoids the haversine for most pairs.
+    """
+    if abs(a.latitude - b.latitude) > lat_box:
+        return None
+    # Longitude degrees shrink with latitude
+    cos_lat = math.cos(math.radians(b.latitude))
+    lon_box = distance_tolerance / (KM_PER_DEGREE * cos_lat) if cos_lat > 1e-6 else 360.0
+    if abs(a.longitude - b.longitude) > lon_box:
+        return None
+    if abs(a.magnitude - b.magnitude) > magnitude_tolerance:
+        return None
+    distance = distance_km(a.latitude, a.longitude, b.latitude, b.longitude)
+    return distance if distance <= distance_tolerance else None
+
+
+def location_key(report):
+    return (report.time, report.latitude, report.longitude)
+
+
+def match_stored(reports, existing, time_tolerance, distance_tolerance, magnitude_tolerance):
+    """
+    First pass: attaches reports to stored earthquakes.
+    - A source that already reported a stored earthquake (EarthquakeSource) is compared
+      with its own previous report, other sources with the earthquake
+    - The same time and epicenter always match (a revised depth or magnitude),
+      otherwise the report must be within the tolerances
+    - A stored earthquake takes at most one report per source, the closest one,
+      so a nearby event listed next to the revised one stays a different event
+    Returns the clusters of the stored earthquakes that got reports and the unmatched reports.
+    """
+    existing = sorted(existing, key=lambda earthquake: earthquake.time)
+    times = [earthquake.time for earthquake in existing]
+    known = [{source.source: source for source in earthquake.sources.all()} for earthquake in existing]
+    lat_box = distance_tolerance / KM_PER_DEGREE
+
+    # Candidate pairs from the stored earthquakes inside the time tolerance
+    pairs = []
+    for r, report in enumerate(reports):
+        low = bisect_left(times, report.time - time_tolerance)
+        high = bisect_right(times, report.time + time_tolerance)
+        for e in range(low, high):
+            previous = known[e].get(report.source, existing[e])
+            if location_key(previous) == location_key(report):
+                pairs.append((0, 0.0, r, e))
+                continue
+            distance = within_tolerances(previous, report, lat_box, distance_tolerance, magnitude_tolerance)
+            if distance is not None:
+                pairs.append((1, distance, r, e))
+
+    # Closest pairs first, same time and epicenter before everything else
+    pairs.sort()
+    clusters = {}
+    matched = set()
+    taken = set()
+    for _, _, r, e in pairs:
+        report = reports[r]
+        if r in matched or (e, report.source) in taken:
+            continue
+        matched.add(r)
+        taken.add((e, report.source))
+        if e not in clusters:
+            clusters[e] = Cluster(existing[e])
+            clusters[e].earthquake = existing[e]
+        clusters[e].reports.append(report)
+
+    unmatched = [report for r, report in enumerate(reports) if r not in matched]
+    return list(clusters.values()), unmatched
+
+
+def merge_reports(reports, existing, time_tolerance, distance_tolerance, magnitude_tolerance):
+    """
+    Groups reports of the same event from different sources.
+    - reports: Reports from all sources
+    - existing: Earthquakes already stored around the same period (sources prefetched)
+    - time_tolerance: timedelta, distance_tolerance: km, magnitude_tolerance: magnitude units
+    Reports are first matched with the stored earthquakes, the rest are grouped among
+    themselves. Two reports of the same source are never merged.
+    Returns the clusters that contain at least one report.
+    """
+    clusters, reports = match_stored(reports, existing, time_tolerance, distance_tolerance, magnitude_tolerance)
+
+    lat_box = distance_tolerance / KM_PER_DEGREE
+    window = deque()
+
+    for report in sorted(reports, key=lambda report: report.time):
+        # Drop clusters that are too old to match anything from now on
+        while window and window[0].time < report.time - time_tolerance:
+            window.popleft()
+
+        best, best_distance = None, None
+        for cluster in window:
+            if report.source in cluster.sources():
+                continue
+            distance = within_tolerances(cluster, report, lat_box, distance_tolerance, magnitude_tolerance)
+            if distance is not None and (best is None or distance < best_distance):
+                best, best_distance = cluster, distance
+
+        if best is None:
+            best = Cluster(report)
+            window.append(best)
+            clusters.append(best)
+        best.reports.append(report)
+
+    return clusters
+
+
+def stored_candidates(queryset, reports, time_tolerance):
+    """
+    Earthquakes already stored in the period covered by the reports (plus the tolerance).
+    """
+    if not reports:
+        return []
+    start = min(report.time for report in reports) - time_tolerance
+    end = max(report.time for report in reports) + time_tolerance
+    return list(queryset.filter(time__gte=start, time__lte=end).prefetch_related('sources'))
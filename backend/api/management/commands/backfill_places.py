@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor # Label chunks in parallel
+from django.core.management.base import BaseCommand, CommandError # Django base class for making CLI commands
+from django.db import connections
+from api.models import Earthquake # Django model for earthquakes
+from api.gazetteer import get_gazetteer # Nearest place lookup
+
+class Command(BaseCommand):
+    help = "Label stored earthquakes with the nearest place from the gazetteer (GAZETTEER_PATH)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Also relabel earthquakes that already have a place")
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help="Earthquakes per chunk")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Chunks labelled in parallel (always 1 with SQLite)")
+
+    def handle(self, *args, **options):
+        gazetteer = get_gazetteer()
+        if gazetteer is None:
+            raise CommandError("GAZETTEER_PATH is not set.")
+
+        queryset = Earthquake.objects.using('default')
+        if not options['all']:
+            queryset = queryset.filter(place='')
+
+        # Split the ids in contiguous ranges of chunk-size earthquakes
+        ids = list(queryset.order_by('id').values_list('id', flat=True))
+        size = options['chunk_size']
+        chunks = [(ids[i], ids[min(i + size, len(ids)) - 1]) for i in range(0, len(ids), size)]
+
+        def label_chunk(bounds):
+            earthquakes = list(
+                queryset.filter(id__gte=bounds[0], id__lte=bounds[1]).only('id', 'latitude', 'longitude')
+            )
+            gazetteer.label(earthquakes)
+            Earthquake.objects.using('default').bulk_update(earthquakes, ['place', 'place_distance'], batch_size=500)
+            return len(earthquakes)
+
+        def label_chunk_in_thread(bounds):
+            try:
+                return label_chunk(bounds)
+            finally:
+                # Each thread has its own database connection
+                connections.close_all()
+
+        # SQLite allows a single writer, parallel chunks would fail with "database is locked"
+        workers = options['workers']
+        if workers > 1 and connections['default'].vendor == 'sqlite':
+            self.stderr.write("SQLite database: labelling with a single worker.")
+            workers = 1
+
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                total = sum(executor.map(label_chunk_in_thread, chunks))
+        else:
+            total = sum(map(label_chunk, chunks))
+
+        self.stdout.write(self.style.SUCCESS(f"Labelled {total} earthquakes."))
@@ -1,65 +1,105 @@
-import requests # download the XML from the website
-import xml.etree.ElementTree as ET # parse the XML structure
 from django.core.management.base import BaseCommand # Django base class for making CLI commands
-from api.models import Earthquake # Django model for earthquakes
-from datetime import datetime # Convert string timestamps into DateTimeField
-from django.utils import timezone # Django timezone utilities
-import re # Regular Expressions
+from django.db import connections, transaction # Save all sources in one transaction
+from api.models import Earthquake, EarthquakeSource # Django models for earthquakes and their sources
+from api.ingest import fetch_sources, merge_reports, stored_candidates # Fetch, parse and merge the feeds
+from api.gazetteer import label_earthquakes # Nearest place of new earthquakes
+from datetime import timedelta # Time tolerance
 import os
 from dotenv import load_dotenv
 
 class Command(BaseCommand):
-    help = "Fetch and parse earthquake data from XML feed"
+    help = "Fetch and parse earthquake data from one or more XML feeds"
 
     # Load environment variables from .env file
     load_dotenv()
 
-    def handle(self, *args, **kwargs):
-        url = os.getenv('DATA_FETCH_URL', '')
-        response = requests.get(url)
-        root = ET.fromstring(response.content)
+    def add_arguments(self, parser):
+        parser.add_argument('--source', action='append', dest='sources',
+                            help="Feed URL to fetch (repeatable), overrides DATA_FETCH_URLS / DATA_FETCH_URL")
+        parser.add_argument('--timeout', type=float, default=float(os.getenv('DATA_FETCH_TIMEOUT', 10)),
+                            help="Total time allowed per source in seconds")
+        parser.add_argument('--time-tolerance', type=float, default=float(os.getenv('DEDUP_TIME_SECONDS', 10)),
+                            help="Max time difference in seconds for reports of the same event")
+        parser.add_argument('--distance-tolerance', type=float, default=float(os.getenv('DEDUP_DISTANCE_KM', 30)),
+                            help="Max epicenter distance in km for reports of the same event")
+        parser.add_argument('--magnitude-tolerance', type=float, default=float(os.getenv('DEDUP_MAGNITUDE', 0.5)),
+                            help="Max magnitude difference for reports of the same event")
 
-        self.stderr.write(f"Data Fetch URL: {url}\n")
+    def handle(self, *args, **options):
+        # Sources in priority order: the first source's values are stored for merged events
+        urls = options['sources'] or [
+            url.strip() for url in os.getenv('DATA_FETCH_URLS', os.getenv('DATA_FETCH_URL', '')).split(',') if url.strip()
+        ]
+        time_tolerance = timedelta(seconds=options['time_tolerance'])
 
-        for item in root.findall(".//item"):
-            desc = item.find("description").text
+        for url in urls:
+            self.stderr.write(f"Data Fetch URL: {url}\n")
 
-            # Replace <br> with newlines so regex works line by line
-            cleaned_desc = desc.replace("<br>", "\n")
+        reports = []
+        for url, source_reports, errors in fetch_sources(urls, options['timeout']):
+            for error in errors:
+                self.stderr.write(error)
+            reports.extend(source_reports)
 
-            # Parse values from string using regex
-            try:
-                # Time
-                time_match = re.search(r"Time:\s*(\d{2}-[A-Za-z]{3}-\d{4} \d{2}:\d{2}:\d{2})", cleaned_desc)
-                # Latitude
-                lat_match = re.search(r"Latitude:\s*([\d.]+)N", cleaned_desc)
-                # Longitude
-                lon_match = re.search(r"Longitude:\s*([\d.]+)E", cleaned_desc)
-                # Depth
-                depth_match = re.search(r"Depth:\s*([\d.]+)km", cleaned_desc)
-                # Magnitude
-                mag_match = re.search(r"M\s*([\d.]+)", cleaned_desc)
+        existing = stored_candidates(Earthquake.objects.using('default'), reports, time_tolerance)
+        clusters = merge_reports(
+            reports,
+            existing,
+            time_tolerance,
+            options['distance_tolerance'],
+            options['magnitude_tolerance'],
+        )
 
-                if all([time_match, lat_match, lon_match, depth_match, mag_match]):
-                    time_str = time_match.group(1)
-                    time = timezone.make_aware(datetime.strptime(time_str, "%d-%b-%Y %H:%M:%S"))
+        # New earthquakes, labelled with the nearest place in one batch
+        new_clusters = [cluster for cluster in clusters if cluster.earthquake is None]
+        new_earthquakes = label_earthquakes([
+            Earthquake(
+                time=report.time,
+                latitude=report.latitude,
+                longitude=report.longitude,
+                depth=report.depth,
+                magnitude=report.magnitude
+            )
+            for report in (cluster.canonical() for cluster in new_clusters)
+        ])
 
-                    latitude = float(lat_match.group(1))
-                    longitude = float(lon_match.group(1))
-                    depth = float(depth_match.group(1))
-                    magnitude = float(mag_match.group(1))
+        with transaction.atomic(using='default'):
+            for cluster, earthquake in zip(new_clusters, new_earthquakes):
+                cluster.earthquake, created = Earthquake.objects.using('default').get_or_create(
+                    time=earthquake.time,
+                    latitude=earthquake.latitude,
+                    longitude=earthquake.longitude,
+                    depth=earthquake.depth,
+                    magnitude=earthquake.magnitude,
+                    defaults={'place': earthquake.place, 'place_distance': earthquake.place_distance}
+                )
+                if created:
+                    self.stdout.write(self.style.SUCCESS(f"Added: {earthquake.time} M {earthquake.magnitude}"))
 
-                    if not Earthquake.objects.filter(time=time, latitude=latitude, longitude=longitude).exists():
-                        Earthquake.objects.create(
-                            time=time,
-                            latitude=latitude,
-                            longitude=longitude,
-                            depth=depth,
-                            magnitude=magnitude
-                        )
-                        self.stdout.write(self.style.SUCCESS(f"Added: {time} M {magnitude}"))
-                else:
-                    raise ValueError("Could not find all fields in the description.")
+            sources = []
+            for cluster in clusters:
+                # Provenance: what each source reported for this event
+                sources.extend(
+                    EarthquakeSource(
+                        earthquake=cluster.earthquake,
+                        source=report.source,
+                        time=report.time,
+                        latitude=report.latitude,
+                        longitude=report.longitude,
+                        depth=report.depth,
+                        magnitude=report.magnitude
+                    )
+                    for report in cluster.reports
+                )
 
-            except Exception as e:
-                self.stderr.write(f"Failed to parse entry: {e}")
\ No newline at end of file
+            # A source already stored for the earthquake gets its revised values
+            connection = connections['default']
+            EarthquakeSource.objects.using('default').bulk_create(
+                sources,
+                update_conflicts=True,
+                unique_fields=(
+                    ['earthquake', 'source'] if connection.features.supports_update_conflicts_with_target else None
+                ),
+                update_fields=['time', 'latitude', 'longitude', 'depth', 'magnitude'],
+                batch_size=500
+            )
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-19 11:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_alter_earthquake_unique_together'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EarthquakeSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255)),
+                ('time', models.DateTimeField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('depth', models.FloatField()),
+                ('magnitude', models.FloatField()),
+                ('fetched_at', models.DateTimeField(auto_now_add=True)),
+                ('earthquake', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sources', to='api.earthquake')),
+            ],
+            options={
+                'unique_together': {('earthquake', 'source')},
+            },
+        ),
+    ]
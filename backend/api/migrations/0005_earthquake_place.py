@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_earthquakesource'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='earthquake',
+            name='place',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='earthquake',
+            name='place_distance',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
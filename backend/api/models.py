@@ -9,10 +9,32 @@ class Earthquake(models.Model):
     longitude = models.FloatField()
     depth = models.FloatField()
     magnitude = models.FloatField()
-    
+    place = models.CharField(max_length=255, blank=True, default='', db_index=True)  # Nearest place from the gazetteer
+    place_distance = models.FloatField(null=True, blank=True)  # Distance from the nearest place in km
+
     class Meta:
         unique_together = ('time', 'latitude', 'longitude', 'depth', 'magnitude')
         ordering = ['-time']  # Ordering: latest first
 
     def __str__(self):
-        return f"{self.time} | M{self.magnitude}M | Lat: {self.latitude}N | Lon: {self.longitude}E | Depth: {self.depth} km"
\ No newline at end of file
+        return f"{self.time} | M{self.magnitude}M | Lat: {self.latitude}N | Lon: {self.longitude}E | Depth: {self.depth} km"
+
+
+class EarthquakeSource(models.Model):
+    """
+    Model representing the report of an earthquake event by one data source.
+    """
+    earthquake = models.ForeignKey(Earthquake, on_delete=models.CASCADE, related_name='sources')
+    source = models.CharField(max_length=255)
+    time = models.DateTimeField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    depth = models.FloatField()
+    magnitude = models.FloatField()
+    fetched_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('earthquake', 'source')
+
+    def __str__(self):
+        return f"{self.source} | {self.time} | M{self.magnitude}M"
@@ -0,0 +1,25 @@
+import codecs
+import json
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline-delimited JSON (one object per line) into a list.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        if stream is None:
+            return []
+
+        try:
+            reader = codecs.getreader(encoding)(stream)
+            return [json.loads(line) for line in reader if line.strip()]
+        except ValueError as exc:
+            raise ParseError(f"NDJSON parse error - {exc}")
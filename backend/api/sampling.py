@@ -0,0 +1,134 @@
+"""
+Limiting of huge result sets for the map (?max_points=N on /earthquakes/).
+
+All earthquakes above a magnitude threshold are kept, and the rest are sampled
+deterministically per cell of a lat/lon grid, proportionally to each cell's count.
+Selection only works on columns pulled with values_list, never on model instances.
+"""
+import math
+
+import numpy as np
+
+from .hot_window import FIELDS, EarthquakeColumns, to_micros
+
+BATCH_SIZE = 500
+
+
+def grid_cells(latitude, longitude, size):
+    """
+    Cell number of each point in a size x size grid over the points' bounding box.
+    """
+    def axis(values):
+        low, high = values.min(), values.max()
+        if high <= low:
+            return np.zeros(len(values), dtype=np.int64)
+        return np.clip(((values - low) / (high - low) * size).astype(np.int64), 0, size - 1)
+
+    return axis(latitude) * size + axis(longitude)
+
+
+def stratified_sample(ids, time, latitude, longitude, budget):
+    """
+    Picks budget of the points (budget < number of points), spread over a lat/lon grid.
+    - Each cell gets a share proportional to its count (largest remainder rounding)
+    - Inside a cell the picks are evenly spaced in time
+    Returns the indices of the picked points and the grid size.
+    """
+    size = max(1, math.ceil(math.sqrt(budget / 4)))
+    cells = grid_cells(latitude, longitude, size)
+
+    # Sort by cell, then time, then id so the result is deterministic
+    order = np.lexsort((ids, time, cells))
+    _, starts, counts = np.unique(cells[order], return_index=True, return_counts=True)
+
+    exact = budget * counts / len(ids)
+    quotas = np.floor(exact).astype(np.int64)
+    remaining = budget - int(quotas.sum())
+    if remaining > 0:
+        quotas[np.argsort(-(exact - quotas), kind='stable')[:remaining]] += 1
+
+    picked = quotas > 0
+    starts, counts, quotas = starts[picked], counts[picked], quotas[picked]
+
+    # Position j of the picks in each cell: start + (j + 0.5) * count / quota
+    offsets = np.repeat(np.cumsum(quotas) - quotas, quotas)
+    j = np.arange(int(quotas.sum())) - offsets
+    positions = (
+        np.repeat(starts, quotas)
+        + np.floor((j + 0.5) * np.repeat(counts, quotas) / np.repeat(quotas, quotas)).astype(np.int64)
+    )
+    return order[positions], size
+
+
+def select_points(ids, time, latitude, longitude, magnitude, max_points):
+    """
+    Chooses at most max_points of the given earthquakes (more than max_points).
+    Returns the chosen indices and the sampling metadata.
+    """
+    total = len(ids)
+
+    # Keep every earthquake above the magnitude of the (max_points // 2 + 1)-th largest
+    strong_budget = max_points // 2
+    threshold = float(-np.partition(-magnitude, strong_budget)[strong_budget])
+    strong = magnitude > threshold
+
+    rest = np.flatnonzero(~strong)
+    budget = max_points - int(strong.sum())
+    sampled, grid_size = stratified_sample(ids[rest], time[rest], latitude[rest], longitude[rest], budget)
+
+    indices = np.concatenate((np.flatnonzero(strong), rest[sampled]))
+    return indices, {
+        "total": total,
+        "returned": len(indices),
+        "magnitude_threshold": threshold,
+        "above_threshold": int(strong.sum()),
+        "below_threshold": len(rest),
+        "sampled_below_threshold": len(sampled),
+        "grid_size": grid_size,
+    }
+
+
+def limit_columns(columns, max_points):
+    """
+    Limits EarthquakeColumns (e.g. from the hot window) to max_points.
+    Returns the columns and the sampling metadata (None if nothing was dropped).
+    """
+    if len(columns) <= max_points:
+        return columns, None
+
+    indices, sampling = select_points(
+        columns.id, columns.time, columns.latitude, columns.longitude, columns.magnitude, max_points
+    )
+    return columns.take(np.sort(indices)), sampling
+
+
+def limit_queryset(queryset, max_points):
+    """
+    Limits a filtered queryset to max_points.
+    Returns the chosen earthquakes as EarthquakeColumns and the sampling metadata,
+    or (None, None) if the queryset is within the budget.
+    """
+    if queryset.count() <= max_points:
+        return None, None
+
+    rows = list(queryset.order_by().values_list('id', 'time', 'latitude', 'longitude', 'magnitude'))
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    indices, sampling = select_points(
+        ids,
+        np.array([to_micros(row[1]) for row in rows], dtype=np.int64),
+        np.array([row[2] for row in rows], dtype=np.float64),
+        np.array([row[3] for row in rows], dtype=np.float64),
+        np.array([row[4] for row in rows], dtype=np.float64),
+        max_points,
+    )
+
+    # Load the chosen earthquakes in chunks of ids
+    chosen = np.sort(ids[indices]).tolist()
+    rows = []
+    for i in range(0, len(chosen), BATCH_SIZE):
+        rows.extend(
+            queryset.model.objects.using(queryset.db)
+            .filter(id__in=chosen[i:i + BATCH_SIZE])
+            .values_list(*FIELDS)
+        )
+    return EarthquakeColumns.from_rows(rows), sampling
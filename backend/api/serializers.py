@@ -12,7 +12,7 @@ class EarthquakeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Earthquake
-        fields = ['id', 'time', 'latitude', 'longitude', 'depth', 'magnitude']
+        fields = ['id', 'time', 'latitude', 'longitude', 'depth', 'magnitude', 'place', 'place_distance']
 
     def get_time(self, obj):
         return obj.time.strftime("%d-%m-%Y %H:%M:%S UTC")
@@ -1,3 +1,614 @@
-from django.test import TestCase
+import importlib.util
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import time
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .models import Earthquake, EarthquakeSource
+from .hot_window import hot_window
+from .gazetteer import Gazetteer, load_places
+from .ingest import distance_km, parse_feed
 
-# Create your tests here.
+
+class HotWindowTests(TestCase):
+    """
+    The in-memory hot window must give the same answers as the database.
+    """
+
+    def setUp(self):
+        now = timezone.now().replace(microsecond=0)
+        self.now = now
+        rows = [
+            (now - timezone.timedelta(hours=1), 38.10, 23.70, 10.0, 2.5),
+            (now - timezone.timedelta(hours=3), 37.95, 22.40, 5.2, 3.1),
+            (now - timezone.timedelta(hours=7), 39.60, 20.85, 18.0, 4.4),
+            (now - timezone.timedelta(hours=20), 35.30, 25.10, 60.0, 1.5),
+            (now - timezone.timedelta(hours=30), 36.40, 27.00, 12.0, 5.0),
+            (now - timezone.timedelta(days=10), 40.00, 22.00, 8.0, 3.0),
+        ]
+        for time, latitude, longitude, depth, magnitude in rows:
+            Earthquake.objects.create(
+                time=time, latitude=latitude, longitude=longitude, depth=depth, magnitude=magnitude
+            )
+        hot_window.invalidate()
+        self.client = APIClient()
+
+    def tearDown(self):
+        hot_window.invalidate()
+
+    def get_both(self, url, params):
+        hot = self.client.get(url, params).json()
+        with override_settings(HOT_WINDOW_ENABLED=False):
+            db = self.client.get(url, params).json()
+        return hot, db
+
+    def test_filters_inside_window_are_served_from_memory(self):
+        self.assertIsNotNone(hot_window.select({}))
+        self.assertIsNotNone(hot_window.select({'min_magnitude': '3'}))
+
+    def test_filters_outside_window_fall_back_to_database(self):
+        day = (self.now - timezone.timedelta(days=10)).strftime("%Y-%m-%d")
+        self.assertIsNone(hot_window.select({'min_date': day, 'max_date': day}))
+        self.assertIsNone(hot_window.select({'min_date': day}))
+        self.assertIsNone(hot_window.select({'min_latitude': 'abc'}))
+
+    def test_filters_before_window_do_not_query(self):
+        hot_window.select({})
+        hot_window.loaded_at -= 3600    # stale, would be reloaded if used
+        with self.assertNumQueries(0):
+            self.assertIsNone(hot_window.select({'min_date': '2020-01-01', 'max_date': '2024-12-31'}))
+
+    def test_stale_window_is_served_while_another_thread_reloads(self):
+        hot_window.select({})
+        hot_window.loaded_at -= 3600
+        with hot_window.reload_lock:
+            # Only the catch-up query, no reload
+            with self.assertNumQueries(1):
+                self.assertEqual(len(hot_window.select({})), 4)
+
+    def test_list_matches_database(self):
+        for params in [
+            {},
+            {'min_magnitude': '2.5'},
+            {'min_latitude': '37', 'max_latitude': '39', 'max_depth': '10'},
+            {'min_longitude': '21', 'max_longitude': '24', 'max_magnitude': '3.1'},
+            {'min_depth': '100'},
+        ]:
+            hot, db = self.get_both('/earthquakes/', params)
+            self.assertEqual(hot, db, params)
+
+    def test_stats_match_database(self):
+        for params in [{}, {'min_magnitude': '3'}, {'min_depth': '100'}]:
+            hot, db = self.get_both('/earthquakes/stats/', params)
+            self.assertEqual(hot, db, params)
+
+    def test_rows_inserted_without_signals_are_added(self):
+        hot_window.select({})
+        # bulk_create sends no signals, like an insert from another process
+        Earthquake.objects.bulk_create([
+            Earthquake(time=self.now, latitude=38.0, longitude=23.0, depth=7.0, magnitude=3.3),
+            Earthquake(time=self.now - timezone.timedelta(days=3), latitude=38.0, longitude=23.0, depth=7.0, magnitude=3.3),
+        ])
+        for url in ['/earthquakes/', '/earthquakes/stats/']:
+            hot, db = self.get_both(url, {'min_magnitude': '3.3', 'max_magnitude': '3.3'})
+            self.assertEqual(hot, db)
+        self.assertEqual(len(hot_window.select({'min_magnitude': '3.3', 'max_magnitude': '3.3'})), 1)
+
+    def test_saves_and_deletes_update_window(self):
+        hot_window.select({})
+        with self.captureOnCommitCallbacks(execute=True):
+            quake = Earthquake.objects.create(
+                time=self.now, latitude=38.0, longitude=23.0, depth=7.0, magnitude=3.3
+            )
+        hot, db = self.get_both('/earthquakes/', {})
+        self.assertEqual(hot, db)
+        self.assertEqual(hot[0]['id'], quake.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            quake.delete()
+        hot, db = self.get_both('/earthquakes/', {})
+        self.assertEqual(hot, db)
+
+
+class BatchEndpointTests(TestCase):
+    """
+    POST /earthquakes/batch/ validates every item and inserts the valid ones once.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        Earthquake.objects.create(
+            time=timezone.datetime(2025, 5, 1, 12, 0, tzinfo=timezone.get_fixed_timezone(0)),
+            latitude=38.1, longitude=23.7, depth=10.0, magnitude=2.5
+        )
+
+    def test_json_array(self):
+        items = [
+            {"time": "2025-05-01T12:00:00Z", "latitude": 38.1, "longitude": 23.7, "depth": 10.0, "magnitude": 2.5},
+            {"time": "2025-05-02T08:30:00Z", "latitude": 37.9, "longitude": 22.4, "depth": 5.0, "magnitude": 3.1},
+            {"time": "2025-05-02T08:30:00Z", "latitude": 37.9, "longitude": 22.4, "depth": 5.0, "magnitude": 3.1},
+            {"time": "yesterday", "latitude": 95, "longitude": 22.4, "depth": 5.0},
+            "not an object",
+        ]
+        response = self.client.post('/earthquakes/batch/', items, format='json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertEqual((data["created"], data["duplicates"], data["invalid"]), (1, 2, 2))
+        self.assertEqual([r["status"] for r in data["results"]],
+                         ["duplicate", "created", "duplicate", "invalid", "invalid"])
+        self.assertEqual(set(data["results"][3]["errors"]), {"time", "latitude", "magnitude"})
+        self.assertEqual(Earthquake.objects.count(), 2)
+
+    def test_ndjson_stream(self):
+        body = (
+            '{"time": "2025-05-03T01:00:00", "latitude": 35.3, "longitude": 25.1, "depth": 60, "magnitude": 1.5}\n'
+            '\n'
+            '{"time": "2025-05-03T02:00:00+03:00", "latitude": "36.4", "longitude": 27, "depth": 12, "magnitude": 5}\n'
+        )
+        response = self.client.post('/earthquakes/batch/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"], 2)
+        self.assertTrue(Earthquake.objects.filter(
+            time=timezone.datetime(2025, 5, 2, 23, 0, tzinfo=timezone.get_fixed_timezone(0)), magnitude=5
+        ).exists())
+
+    def test_rejects_non_list(self):
+        response = self.client.post('/earthquakes/batch/', {"time": "2025-05-03T01:00:00"}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_keeps_hot_window_loaded(self):
+        hot_window.invalidate()
+        self.addCleanup(hot_window.invalidate)
+        hot_window.select({})
+
+        now = timezone.now().replace(microsecond=0)
+        item = {"time": now.isoformat(), "latitude": 38.0, "longitude": 23.0, "depth": 7.0, "magnitude": 3.3}
+        self.client.post('/earthquakes/batch/', [item], format='json')
+
+        self.assertIsNotNone(hot_window.columns)
+        self.assertEqual([e["magnitude"] for e in self.client.get('/earthquakes/').json()], [3.3])
+
+    def test_row_committed_after_lookup_is_duplicate(self):
+        # The lookup misses the stored row, as if a concurrent request committed it in between
+        items = [
+            {"time": "2025-05-02T08:30:00Z", "latitude": 37.9, "longitude": 22.4, "depth": 5.0, "magnitude": 3.1},
+            {"time": "2025-05-01T12:00:00Z", "latitude": 38.1, "longitude": 23.7, "depth": 10.0, "magnitude": 2.5},
+        ]
+        with mock.patch('api.batch.stored_keys', return_value=set()):
+            response = self.client.post('/earthquakes/batch/', items, format='json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertEqual((data["created"], data["duplicates"]), (1, 1))
+        self.assertEqual([r["status"] for r in data["results"]], ["created", "duplicate"])
+        self.assertEqual(Earthquake.objects.count(), 2)
+
+
+def feed_xml(*events):
+    """
+    XML feed in the format of DATA_FETCH_URL, events as (time, latitude, longitude, depth, magnitude).
+    """
+    items = "".join(
+        f"<item><description>M {magnitude}&lt;br&gt;Time: {time}&lt;br&gt;"
+        f"Latitude: {latitude}N&lt;br&gt;Longitude: {longitude}E&lt;br&gt;Depth: {depth}km</description></item>"
+        for time, latitude, longitude, depth, magnitude in events
+    )
+    return f"<rss><channel>{items}</channel></rss>".encode()
+
+
+class FeedServer:
+    """
+    Local stand-in for an agency feed, serving `body` (can be changed between fetches)
+    after an optional delay, optionally one byte every `drip` seconds.
+    """
+
+    def __init__(self, body, delay=0, drip=0):
+        self.body = body
+        feed = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(delay)
+                # The client may give up before the end (timeout tests)
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/xml")
+                    self.end_headers()
+                    if not drip:
+                        self.wfile.write(feed.body)
+                        return
+                    for i in range(len(feed.body)):
+                        self.wfile.write(feed.body[i:i + 1])
+                        time.sleep(drip)
+                except OSError:
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/seismicity.xml"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FetchEarthquakesTests(TestCase):
+    """
+    fetch_earthquakes merges reports of the same event from several sources.
+    """
+
+    def setUp(self):
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.close()
+
+    def serve(self, *events, delay=0, drip=0):
+        server = FeedServer(feed_xml(*events), delay, drip)
+        self.servers.append(server)
+        return server.url
+
+    def fetch(self, *urls, **options):
+        call_command("fetch_earthquakes", *[f"--source={url}" for url in urls],
+                     stdout=StringIO(), stderr=StringIO(), **options)
+
+    def test_merges_reports_within_tolerances(self):
+        first = self.serve(
+            ("01-May-2025 12:00:00", 38.10, 23.70, 10.0, 3.5),
+            ("01-May-2025 12:00:30", 38.40, 23.90, 8.0, 2.1),
+        )
+        second = self.serve(
+            ("01-May-2025 12:00:04", 38.15, 23.75, 12.0, 3.7),   # same event as the first one
+            ("01-May-2025 12:00:31", 36.00, 27.00, 8.0, 2.1),    # too far away
+            ("01-May-2025 18:00:00", 35.00, 25.00, 5.0, 4.0),
+        )
+        self.fetch(first, second)
+
+        self.assertEqual(Earthquake.objects.count(), 4)
+        merged = Earthquake.objects.get(sources__source=second, sources__magnitude=3.7)
+        self.assertEqual(merged.magnitude, 3.5)     # Values of the first source are kept
+        self.assertEqual(set(merged.sources.values_list("source", flat=True)), {first, second})
+
+        # Fetching again only confirms what is already stored
+        self.fetch(second, first)
+        self.assertEqual(Earthquake.objects.count(), 4)
+        self.assertEqual(EarthquakeSource.objects.count(), 5)
+
+    def test_matches_stored_earthquakes(self):
+        stored = Earthquake.objects.create(
+            time=timezone.datetime(2025, 5, 1, 12, 0, tzinfo=timezone.get_fixed_timezone(0)),
+            latitude=38.10, longitude=23.70, depth=10.0, magnitude=3.5
+        )
+        url = self.serve(("01-May-2025 11:59:58", 38.12, 23.68, 9.0, 3.4))
+        self.fetch(url)
+
+        self.assertEqual(Earthquake.objects.count(), 1)
+        self.assertEqual(stored.sources.get().source, url)
+
+    def test_late_published_nearby_event_is_kept(self):
+        server = FeedServer(feed_xml(("01-May-2025 12:00:00", 38.10, 23.70, 10.0, 3.0)))
+        self.servers.append(server)
+        self.fetch(server.url)
+
+        # Next fetch also lists an earlier, nearby (~14 km) event published late
+        server.body = feed_xml(
+            ("01-May-2025 11:59:55", 38.20, 23.79, 10.0, 2.8),
+            ("01-May-2025 12:00:00", 38.10, 23.70, 10.0, 3.0),
+        )
+        self.fetch(server.url)
+        self.fetch(server.url)
+
+        self.assertEqual(sorted(Earthquake.objects.values_list("magnitude", flat=True)), [2.8, 3.0])
+        self.assertEqual(EarthquakeSource.objects.count(), 2)
+        self.assertEqual(Earthquake.objects.get(magnitude=2.8).sources.get().source, server.url)
+
+    def test_revised_report_updates_its_source(self):
+        server = FeedServer(feed_xml(("01-May-2025 12:00:00", 38.10, 23.70, 10.0, 3.0)))
+        self.servers.append(server)
+        self.fetch(server.url)
+
+        # The agency revises the depth and magnitude of the same event
+        server.body = feed_xml(("01-May-2025 12:00:00", 38.10, 23.70, 12.0, 3.2))
+        self.fetch(server.url)
+
+        self.assertEqual(Earthquake.objects.count(), 1)
+        source = EarthquakeSource.objects.get()
+        self.assertEqual((source.depth, source.magnitude), (12.0, 3.2))
+
+    def test_nearby_event_next_to_stored_earthquake_without_sources(self):
+        Earthquake.objects.create(
+            time=timezone.datetime(2025, 5, 1, 12, 0, tzinfo=timezone.get_fixed_timezone(0)),
+            latitude=38.10, longitude=23.70, depth=10.0, magnitude=3.0
+        )
+        url = self.serve(
+            ("01-May-2025 11:59:55", 38.20, 23.79, 10.0, 2.8),
+            ("01-May-2025 12:00:00", 38.10, 23.70, 10.0, 3.0),
+        )
+        self.fetch(url)
+
+        self.assertEqual(sorted(Earthquake.objects.values_list("magnitude", flat=True)), [2.8, 3.0])
+        self.assertEqual(Earthquake.objects.get(magnitude=3.0).sources.get().magnitude, 3.0)
+
+    def test_slow_source_does_not_block_others(self):
+        fast = self.serve(("01-May-2025 12:00:00", 38.10, 23.70, 10.0, 3.5))
+        slow = self.serve(("01-May-2025 13:00:00", 37.10, 22.70, 10.0, 2.5), delay=2)
+        started = time.monotonic()
+        self.fetch(slow, fast, timeout=0.5)
+
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(list(EarthquakeSource.objects.values_list("source", flat=True)), [fast])
+
+    def test_trickling_source_stops_at_deadline(self):
+        # Each byte arrives well within the timeout, the whole feed does not
+        fast = self.serve(("01-May-2025 12:00:00", 38.10, 23.70, 10.0, 3.5))
+        slow = self.serve(("01-May-2025 13:00:00", 37.10, 22.70, 10.0, 2.5), drip=0.02)
+        started = time.monotonic()
+        self.fetch(slow, fast, timeout=0.5)
+
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(list(EarthquakeSource.objects.values_list("source", flat=True)), [fast])
+
+
+class GazetteerTests(TestCase):
+    """
+    Nearest place labelling from a local gazetteer file.
+    """
+    PLACES = [("Athens", 37.98, 23.73), ("Patras", 38.25, 21.73), ("Heraklion", 35.34, 25.13), ("Thessaloniki", 40.64, 22.94)]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "places.csv"
+        self.path.write_text("Name, Latitude, Longitude\n" + "".join(f"{n},{lat},{lon}\n" for n, lat, lon in self.PLACES))
+        self.client = APIClient()
+        hot_window.invalidate()
+
+    def tearDown(self):
+        self.directory.cleanup()
+        hot_window.invalidate()
+
+    def test_nearest_matches_brute_force(self):
+        gazetteer = Gazetteer.from_file(self.path, max_distance=150)
+        points = [(38.0, 23.5), (38.3, 21.9), (35.0, 25.0), (40.5, 23.1), (39.3, 20.0), (36.9, 23.0)]
+        labels = gazetteer.nearest([lat for lat, _ in points], [lon for _, lon in points])
+
+        for (lat, lon), (place, distance) in zip(points, labels):
+            best = min((distance_km(lat, lon, p_lat, p_lon), name) for name, p_lat, p_lon in self.PLACES)
+            if best[0] <= 150:
+                self.assertEqual(place, best[1])
+                self.assertAlmostEqual(distance, best[0], delta=0.1)
+            else:
+                self.assertEqual((place, distance), ("", None))
+
+    def test_geojson_points_and_polygons(self):
+        path = Path(self.directory.name) / "places.geojson"
+        path.write_text(json.dumps({"type": "FeatureCollection", "features": [
+            {"type": "Feature", "properties": {"name": "Athens"}, "geometry": {"type": "Point", "coordinates": [23.73, 37.98]}},
+            {"type": "Feature", "properties": {"name": "Crete"}, "geometry": {"type": "Polygon", "coordinates": [
+                [[24.0, 35.0], [26.0, 35.0], [26.0, 35.6], [24.0, 35.6], [24.0, 35.0]]
+            ]}},
+        ]}))
+        names, latitudes, longitudes = load_places(path)
+        self.assertEqual(names, ["Athens", "Crete"])
+        self.assertAlmostEqual(latitudes[1], 35.3)
+        self.assertAlmostEqual(longitudes[1], 25.0)
+
+    def test_backfill_and_region_filter(self):
+        now = timezone.now()
+        Earthquake.objects.create(time=now, latitude=38.0, longitude=23.6, depth=10, magnitude=2)
+        Earthquake.objects.create(time=now - timezone.timedelta(hours=1), latitude=35.3, longitude=25.2, depth=10, magnitude=3)
+        Earthquake.objects.create(time=now - timezone.timedelta(hours=2), latitude=30.0, longitude=30.0, depth=10, magnitude=3)
+
+        with override_settings(GAZETTEER_PATH=str(self.path), GAZETTEER_MAX_DISTANCE_KM=50):
+            call_command("backfill_places", chunk_size=2, stdout=StringIO())
+
+        self.assertEqual(
+            list(Earthquake.objects.order_by("-time").values_list("place", flat=True)),
+            ["Athens", "Heraklion", ""]
+        )
+        for params in [{"place": "Athens"}, {"place": "Heraklion", "min_magnitude": "2.5"}, {"place": "Patras"}]:
+            hot = self.client.get("/earthquakes/", params).json()
+            with override_settings(HOT_WINDOW_ENABLED=False):
+                db = self.client.get("/earthquakes/", params).json()
+            self.assertEqual(hot, db)
+            self.assertEqual({row["place"] for row in hot}, {params["place"]} if hot else set())
+        self.assertEqual(len(self.client.get("/earthquakes/", {"place": "Athens"}).json()), 1)
+
+    def test_fetch_labels_new_earthquakes(self):
+        server = FeedServer(feed_xml(("01-May-2025 12:00:00", 38.25, 21.80, 10.0, 3.5)))
+        try:
+            with override_settings(GAZETTEER_PATH=str(self.path), GAZETTEER_MAX_DISTANCE_KM=50):
+                call_command("fetch_earthquakes", f"--source={server.url}", stdout=StringIO(), stderr=StringIO())
+        finally:
+            server.close()
+
+        earthquake = Earthquake.objects.get()
+        self.assertEqual(earthquake.place, "Patras")
+        self.assertAlmostEqual(earthquake.place_distance, 6.1, delta=0.2)
+
+
+
+class TurnTakingExecutor(ThreadPoolExecutor):
+    """
+    Runs the mapped calls in worker threads one at a time, as the in-memory SQLite
+    test database locks tables between connections. Records the threads used.
+    """
+    lock = threading.Lock()
+    threads = []
+
+    def map(self, fn, *iterables):
+        def in_turn(*args):
+            with self.lock:
+                self.threads.append(threading.get_ident())
+                return fn(*args)
+        return super().map(in_turn, *iterables)
+
+
+class BackfillPlacesParallelTests(TransactionTestCase):
+    """
+    backfill_places with several workers (committed rows, read by the worker threads).
+    """
+
+    def test_every_chunk_is_labelled(self):
+        TurnTakingExecutor.threads.clear()
+        now = timezone.now()
+        for i in range(10):
+            latitude, longitude = (38.0, 23.6) if i % 2 else (35.3, 25.2)
+            Earthquake.objects.create(
+                time=now - timezone.timedelta(minutes=i), latitude=latitude, longitude=longitude, depth=10, magnitude=2
+            )
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / "places.csv"
+        path.write_text("name,latitude,longitude\nAthens,37.98,23.73\nHeraklion,35.34,25.13\n")
+
+        # Parallel chunks are only allowed off SQLite
+        command = 'api.management.commands.backfill_places'
+        with mock.patch.object(connections['default'], 'vendor', 'mysql'), \
+                mock.patch(f'{command}.ThreadPoolExecutor', wraps=TurnTakingExecutor) as executor, \
+                override_settings(GAZETTEER_PATH=str(path), GAZETTEER_MAX_DISTANCE_KM=50):
+            stdout = StringIO()
+            call_command("backfill_places", workers=3, chunk_size=2, stdout=stdout)
+
+        executor.assert_called_once_with(max_workers=3)
+        self.assertEqual(len(TurnTakingExecutor.threads), 5)
+        self.assertNotIn(threading.get_ident(), TurnTakingExecutor.threads)
+        self.assertIn("Labelled 10 earthquakes", stdout.getvalue())
+        self.assertEqual(
+            list(Earthquake.objects.order_by("-time").values_list("place", flat=True)),
+            ["Heraklion", "Athens"] * 5
+        )
+
+class MaxPointsTests(TestCase):
+    """
+    GET /earthquakes/?max_points=N keeps the strongest earthquakes and samples the rest.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.now = timezone.now().replace(microsecond=0)
+        earthquakes = []
+        # Two areas, 3 times more earthquakes in the first one
+        for i in range(400):
+            latitude, longitude = (38.0, 23.0) if i % 4 else (35.0, 26.0)
+            earthquakes.append(Earthquake(
+                time=self.now - timezone.timedelta(minutes=i),
+                latitude=latitude + (i % 7) * 0.01,
+                longitude=longitude + (i % 11) * 0.01,
+                depth=10,
+                magnitude=round(1 + (i * 37 % 40) / 10, 1),
+            ))
+        Earthquake.objects.bulk_create(earthquakes)
+        hot_window.invalidate()
+
+    def tearDown(self):
+        hot_window.invalidate()
+
+    def get(self, params, hot=True):
+        with override_settings(HOT_WINDOW_ENABLED=hot):
+            return self.client.get("/earthquakes/", params)
+
+    def test_samples_when_over_budget(self):
+        data = self.get({"max_points": "60"}, hot=False).json()
+        sampling = data["sampling"]
+        magnitudes = [row["magnitude"] for row in data["results"]]
+
+        self.assertEqual(data["total"], 400)
+        self.assertEqual(len(data["results"]), sampling["returned"])
+        self.assertLessEqual(len(data["results"]), 60)
+        self.assertEqual(
+            sum(m > sampling["magnitude_threshold"] for m in magnitudes),
+            Earthquake.objects.filter(magnitude__gt=sampling["magnitude_threshold"]).count()
+        )
+
+        # Sample below the threshold is proportional to each area
+        below = [row for row in data["results"] if row["magnitude"] <= sampling["magnitude_threshold"]]
+        second_area = sum(row["latitude"].startswith("35.") for row in below)
+        self.assertAlmostEqual(second_area / len(below), 0.25, delta=0.08)
+
+    def test_deterministic_and_same_as_hot_window(self):
+        params = {"max_points": "50", "min_magnitude": "1.5"}
+        db = self.get(params, hot=False).json()
+        self.assertEqual(db, self.get(params, hot=False).json())
+        self.assertEqual(db, self.get(params, hot=True).json())
+
+    def test_within_budget_returns_everything(self):
+        data = self.get({"max_points": "1000", "min_magnitude": "4.5"}, hot=False).json()
+        self.assertIsNone(data["sampling"])
+        self.assertEqual(data["results"], self.get({"min_magnitude": "4.5"}, hot=False).json())
+        self.assertEqual(data["total"], len(data["results"]))
+
+    def test_invalid_max_points(self):
+        self.assertEqual(self.get({"max_points": "abc"}).status_code, 400)
+        self.assertEqual(self.get({"max_points": "0"}).status_code, 400)
+
+
+class LoadTestHarnessTests(TestCase):
+    """
+    Pieces of load_test.py that do not need a running server.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Standalone script next to manage.py, loaded by path so the tests run from any directory
+        spec = importlib.util.spec_from_file_location("load_test", settings.BASE_DIR / "load_test.py")
+        cls.load_test = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(cls.load_test)
+
+    def test_synthetic_feed_is_parsed_by_fetch(self):
+        feed = self.load_test.SyntheticFeed(rate=1000, seed=1)
+        time.sleep(0.05)
+        reports, errors = parse_feed(feed.xml(), "feed")
+
+        self.assertEqual(errors, [])
+        self.assertGreater(len(reports), 0)
+        self.assertEqual(len(reports), len(feed.events))
+        self.assertEqual(reports[0].magnitude, feed.events[0]["magnitude"])
+
+    def test_summarize(self):
+        summary = self.load_test.summarize([i / 1000 for i in range(1, 101)], errors=5, duration=10)
+        self.assertEqual(summary["requests"], 105)
+        self.assertEqual(summary["throughput"], 10.5)
+        self.assertAlmostEqual(summary["error_rate"], 5 / 105, places=4)
+        self.assertAlmostEqual(summary["latency_ms"]["p50"], 50.5)
+        self.assertAlmostEqual(summary["latency_ms"]["p99"], 99.01)
+        self.assertIsNone(self.load_test.summarize([], 0, 10)["latency_ms"])
+
+    def test_configured_db_requires_separate_database(self):
+        with mock.patch.dict('os.environ', {"MYSQL_DB_NAME": "seismic"}), mock.patch('sys.stderr', StringIO()):
+            for argv in (["--use-configured-db"], ["--use-configured-db", "--db-name", "seismic"]):
+                with self.assertRaises(SystemExit):
+                    self.load_test.parse_args(argv)
+
+            args = self.load_test.parse_args(["--use-configured-db", "--db-name", "seismic_load_test"])
+        self.assertEqual(args.db_name, "seismic_load_test")
+
+    def test_configured_db_aborts_on_sqlite_fallback(self):
+        with mock.patch.dict('os.environ', {"MYSQL_DB_NAME": "seismic"}), \
+                mock.patch.object(self.load_test, 'database_vendor', return_value='sqlite'), \
+                mock.patch.object(self.load_test.subprocess, 'run') as run:
+            with self.assertRaises(SystemExit):
+                self.load_test.main(["--use-configured-db", "--db-name", "seismic_load_test"])
+        run.assert_not_called()     # Nothing migrated
+
+    def test_database_vendor(self):
+        env = dict(os.environ, USE_SQLITE3="True", SQLITE_PATH=str(Path(tempfile.gettempdir()) / "load_test_vendor.sqlite3"))
+        self.assertEqual(self.load_test.database_vendor(env), "sqlite")
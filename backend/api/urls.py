@@ -16,10 +16,14 @@ urlpatterns = [
 
     # GET /earthquakes/ → list all earthquakes
 
+    # GET /earthquakes/?max_points=N → list at most N earthquakes, sampled if more match
+
     # GET /earthquakes/<id>/ → retrieve a single earthquake
 
     # POST /earthquakes/ → create a new earthquake
 
+    # POST /earthquakes/batch/ → create many earthquakes (JSON array or NDJSON)
+
     # PUT /earthquakes/<id>/ → update an existing one
 
     # DELETE /earthquakes/<id>/ → delete an earthquake
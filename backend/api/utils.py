@@ -2,7 +2,12 @@ from django.utils import timezone
 from datetime import datetime
 from .models import Earthquake
 
-def apply_filters(queryset, params):
+def parse_filters(params):
+    """
+    Translate the query parameters into Django field lookups.
+    - Returns None if only one date is given (no filtering at all)
+    - Raises ValueError if any value has an incorrect format
+    """
     # Extract query parameters
     min_date_str = params.get('min_date', None)
     max_date_str = params.get('max_date', None)
@@ -14,81 +19,69 @@ def apply_filters(queryset, params):
     max_depth = params.get('max_depth', None)
     min_magnitude = params.get('min_magnitude', None)
     max_magnitude = params.get('max_magnitude', None)
+    place = params.get('place', None)
+
+    lookups = {}
 
     # Date filter
     if not min_date_str and not max_date_str:
         # If no dates are provided, filter by last 24 hours
         now = timezone.now()
         past_24h = now - timezone.timedelta(hours=24)
-        queryset = queryset.filter(time__gte=past_24h) 
+        lookups['time__gte'] = past_24h
     elif min_date_str and max_date_str:
-        try:
-            min_date = datetime.strptime(min_date_str, "%Y-%m-%d")
-            max_date = datetime.strptime(max_date_str, "%Y-%m-%d")
+        min_date = datetime.strptime(min_date_str, "%Y-%m-%d")
+        max_date = datetime.strptime(max_date_str, "%Y-%m-%d")
 
-            # Make the dates timezone-aware because timezone support (USE_TZ=True)
-            min_date = timezone.make_aware(min_date)
-            max_date = timezone.make_aware(max_date)
+        # Make the dates timezone-aware because timezone support (USE_TZ=True)
+        min_date = timezone.make_aware(min_date)
+        max_date = timezone.make_aware(max_date)
 
-            if min_date.date() == max_date.date():
-                queryset = queryset.filter(time__date=min_date.date())
-            else:
-                queryset = queryset.filter(time__gte=min_date, time__lt=max_date + timezone.timedelta(days=1))
-        except ValueError:
-            return Earthquake.objects.none()    # If the date format is incorrect, return an empty queryset
+        if min_date.date() == max_date.date():
+            lookups['time__date'] = min_date.date()
+        else:
+            lookups['time__gte'] = min_date
+            lookups['time__lt'] = max_date + timezone.timedelta(days=1)
     else:
-        return queryset     # If only one date is given do not filter, return full queryset (frontend shows error message)
+        return None     # If only one date is given do not filter (frontend shows error message)
 
     # Latitude filters
     if min_latitude:
-        try:
-            queryset = queryset.filter(latitude__gte=float(min_latitude))
-        except ValueError:
-            return Earthquake.objects.none()    # If the latitude format is incorrect, return an empty queryset
-
+        lookups['latitude__gte'] = float(min_latitude)
     if max_latitude:
-        try:
-            queryset = queryset.filter(latitude__lte=float(max_latitude))
-        except ValueError:
-            return Earthquake.objects.none()   # If the latitude format is incorrect, return an empty queryset
+        lookups['latitude__lte'] = float(max_latitude)
 
     # Longitude filters
     if min_longitude:
-        try:
-            queryset = queryset.filter(longitude__gte=float(min_longitude))
-        except ValueError:
-            return Earthquake.objects.none()   # If the longitude format is incorrect, return an empty queryset
-
+        lookups['longitude__gte'] = float(min_longitude)
     if max_longitude:
-        try:
-            queryset = queryset.filter(longitude__lte=float(max_longitude))
-        except ValueError:
-            return Earthquake.objects.none()    # If the longitude format is incorrect, return an empty queryset
+        lookups['longitude__lte'] = float(max_longitude)
 
     # Depth filters
     if min_depth:
-        try:
-            queryset = queryset.filter(depth__gte=float(min_depth))
-        except ValueError:
-            return Earthquake.objects.none()     # If the depth format is incorrect, return an empty queryset
-
+        lookups['depth__gte'] = float(min_depth)
     if max_depth:
-        try:
-            queryset = queryset.filter(depth__lte=float(max_depth))
-        except ValueError:
-            return Earthquake.objects.none()    # If the depth format is incorrect, return an empty queryset   
+        lookups['depth__lte'] = float(max_depth)
 
     # Magnitude filters
     if min_magnitude:
-        try:
-            queryset = queryset.filter(magnitude__gte=float(min_magnitude))
-        except ValueError: 
-            return Earthquake.objects.none()   # If the magnitude format is incorrect, return an empty queryset
-
+        lookups['magnitude__gte'] = float(min_magnitude)
     if max_magnitude:
-        try:
-            queryset = queryset.filter(magnitude__lte=float(max_magnitude))
-        except ValueError:
-            return Earthquake.objects.none()   # If the magnitude format is incorrect, return an empty queryset
+        lookups['magnitude__lte'] = float(max_magnitude)
+
+    # Region filter (nearest place from the gazetteer)
+    if place:
+        lookups['place'] = place
+
+    return lookups
+
+def apply_filters(queryset, params):
+    try:
+        lookups = parse_filters(params)
+    except ValueError:
+        return Earthquake.objects.none()    # If any value has an incorrect format, return an empty queryset
+
+    if lookups is None:
+        return queryset     # If only one date is given do not filter, return full queryset (frontend shows error message)
 
-    return queryset
+    return queryset.filter(**lookups)
@@ -1,11 +1,18 @@
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.conf import settings
 from django.db.models import Avg, Max, Min, Count
 from django.db.models.functions import TruncHour, TruncDay, TruncMonth, TruncYear
 from .models import Earthquake
 from .serializers import EarthquakeSerializer
 from .utils import apply_filters
+from .hot_window import hot_window
+from .parsers import NDJSONParser
+from .batch import validate_batch, upsert_batch
+from .sampling import limit_columns, limit_queryset
 
 class EarthquakeViewSet(viewsets.ModelViewSet):
     """
@@ -20,9 +27,90 @@ class EarthquakeViewSet(viewsets.ModelViewSet):
 
         return apply_filters(queryset, params)
 
+    # Answer from the in-memory hot window when the filters fall inside it
+    def list(self, request, *args, **kwargs):
+        if 'max_points' in request.query_params:
+            return self.limited_list(request)
+
+        selection = hot_window.select(request.query_params)
+        if selection is None:
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.get_serializer(selection.records(), many=True)
+        return Response(serializer.data)
+
+    def limited_list(self, request):
+        """
+        List with ?max_points=N: if more than N earthquakes match the filters, returns
+        all earthquakes above a magnitude threshold plus a spatially stratified sample
+        of the rest (see sampling.py).
+        Returns { total, sampling (null if nothing was dropped), results }
+        """
+        try:
+            max_points = int(request.query_params['max_points'])
+        except ValueError:
+            max_points = 0
+        if max_points < 1:
+            return Response({"detail": "max_points must be a positive integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        selection = hot_window.select(request.query_params)
+        if selection is not None:
+            total = len(selection)
+            columns, sampling = limit_columns(selection, max_points)
+            earthquakes = columns.records()
+        else:
+            queryset = self.get_queryset()
+            columns, sampling = limit_queryset(queryset, max_points)
+            earthquakes = columns.records() if columns is not None else list(queryset)
+            total = sampling["total"] if sampling else len(earthquakes)
+
+        serializer = self.get_serializer(earthquakes, many=True)
+        return Response({
+            "total": total,
+            "sampling": sampling,
+            "results": serializer.data,
+        })
+
+    @action(detail=False, methods=['post'], url_path='batch', parser_classes=[JSONParser, NDJSONParser])
+    def batch(self, request):
+        """
+        Creates many earthquakes at once from a JSON array or an NDJSON stream.
+        - Each item: {"time": ISO 8601, "latitude", "longitude", "depth", "magnitude"}
+        - Items already stored are reported as duplicates and skipped
+        - Returns the status of every item plus aggregate counts
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response({"detail": "Expected a JSON array or NDJSON stream."}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_size = getattr(settings, 'EARTHQUAKE_BATCH_MAX_SIZE', 10000)
+        if len(items) > max_size:
+            return Response({"detail": f"At most {max_size} items per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows, errors = validate_batch(items)
+        # The hot window picks up the new rows by id on its next use
+        statuses = upsert_batch(rows) if rows else {}
+
+        results = []
+        for index in range(len(items)):
+            if index in errors:
+                results.append({"index": index, "status": "invalid", "errors": errors[index]})
+            else:
+                results.append({"index": index, "status": statuses[index]})
+
+        counts = [result["status"] for result in results]
+        return Response({
+            "created": counts.count("created"),
+            "duplicates": counts.count("duplicate"),
+            "invalid": counts.count("invalid"),
+            "results": results,
+        })
+
 #This gives you automatic support for:
   #  GET (list, detail) 
+  #  GET list with ?max_points=N (limited, see limited_list above)
   #  POST (create)
+  #  POST batch (create many, see batch above)
   #  PUT/PATCH (update)
   #  DELETE
 
@@ -38,27 +126,39 @@ class EarthquakeStatsView(APIView):
     """
 
     def get(self, request):
-        queryset = Earthquake.objects.using("default").all()
         params = request.GET
 
-        # Apply all filters (date + others)
-        filtered_qs = apply_filters(queryset, params)
+        # Answer from the in-memory hot window when the filters fall inside it
+        selection = hot_window.select(params)
 
-        if not filtered_qs.exists():
-            return Response({
-                "has_results": False,
-                "filtered_stats": {}
-            })
+        if selection is not None:
+            if not len(selection):
+                return Response({
+                    "has_results": False,
+                    "filtered_stats": {}
+                })
+            start_time, end_time = selection.time_range()
+        else:
+            queryset = Earthquake.objects.using("default").all()
 
-        # Calculates the earliest and latest earthquake timestamps and computes the number of days between them.
-        date_range = filtered_qs.aggregate(min_time=Min("time"), max_time=Max("time"))
-        start_time, end_time = date_range["min_time"], date_range["max_time"]
+            # Apply all filters (date + others)
+            filtered_qs = apply_filters(queryset, params)
 
-        if not start_time or not end_time:
-            return Response({
-                "has_results": False,
-                "filtered_stats": {}
-            })
+            if not filtered_qs.exists():
+                return Response({
+                    "has_results": False,
+                    "filtered_stats": {}
+                })
+
+            # Calculates the earliest and latest earthquake timestamps and computes the number of days between them.
+            date_range = filtered_qs.aggregate(min_time=Min("time"), max_time=Max("time"))
+            start_time, end_time = date_range["min_time"], date_range["max_time"]
+
+            if not start_time or not end_time:
+                return Response({
+                    "has_results": False,
+                    "filtered_stats": {}
+                })
 
         days_range = (end_time - start_time).days
 
@@ -77,16 +177,19 @@ class EarthquakeStatsView(APIView):
             trunc_fn = TruncDay("time")
 
         # Aggregate stats per period
-        per_period = (
-            filtered_qs.annotate(period=trunc_fn)
-            .values("period")
-            .annotate(
-                count=Count("id"),
-                avg_magnitude=Avg("magnitude"),
-                max_magnitude=Max("magnitude"),
+        if selection is not None:
+            per_period = selection.per_period(label)
+        else:
+            per_period = (
+                filtered_qs.annotate(period=trunc_fn)
+                .values("period")
+                .annotate(
+                    count=Count("id"),
+                    avg_magnitude=Avg("magnitude"),
+                    max_magnitude=Max("magnitude"),
+                )
+                .order_by("period")
             )
-            .order_by("period")
-        )
 
         # Format datetime labels for frontend
         def format_datetime(data):
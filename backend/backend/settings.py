@@ -206,4 +206,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # CORS Configuration
 
-CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', '').split(',')
\ No newline at end of file
+CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', '').split(',')
+
+# In-memory hot window of recent earthquakes (serves the default last-24h view)
+
+HOT_WINDOW_ENABLED = str_to_bool(os.getenv('HOT_WINDOW_ENABLED', True))
+HOT_WINDOW_HOURS = int(os.getenv('HOT_WINDOW_HOURS', 24))
+HOT_WINDOW_REFRESH_SECONDS = int(os.getenv('HOT_WINDOW_REFRESH_SECONDS', 60))
+
+# Maximum number of earthquakes accepted by POST /earthquakes/batch/
+
+EARTHQUAKE_BATCH_MAX_SIZE = int(os.getenv('EARTHQUAKE_BATCH_MAX_SIZE', 10000))
+
+# Gazetteer (CSV or GeoJSON of places) used to label earthquakes with the nearest place
+
+GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', '')
+GAZETTEER_MAX_DISTANCE_KM = float(os.getenv('GAZETTEER_MAX_DISTANCE_KM', 50))
@@ -8,6 +8,7 @@ django.setup()
 
 import pytz
 from api.models import Earthquake
+from api.gazetteer import label_earthquakes
 from django.db import connections
 
 using_db = 'default'
@@ -59,6 +60,9 @@ for _, row in df.iterrows():
         )
     )
 
+# Label with the nearest place if a gazetteer is configured (GAZETTEER_PATH)
+label_earthquakes(earthquakes)
+
 Earthquake.objects.using(using_db).bulk_create(earthquakes, ignore_conflicts=True, batch_size=500)
 
 print(f"✅ Inserted {len(earthquakes)} rows into {using_db}.")
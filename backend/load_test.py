@@ -0,0 +1,430 @@
+"""
+Load test harness for the backend.
+
+Starts the Django app under a WSGI/ASGI server, a local stand-in XML feed emitting
+synthetic earthquakes, a fetch_earthquakes loop reading that feed, and N concurrent
+async clients requesting the list and stats endpoints like open dashboards do.
+Prints per endpoint p50/p95/p99 latency, throughput and error rate as JSON, so runs
+can be compared between commits.
+
+Usage (from the backend directory):
+    python load_test.py --clients 50 --duration 60 --output report.json
+
+By default a fresh SQLite database in a temporary directory is used, and the app
+runs under `manage.py runserver`. --use-configured-db runs against the MySQL server
+of the .env file, in the separate database given with --db-name, which keeps the
+synthetic earthquakes after the run. Other servers can be given with --server-command:
+    python load_test.py --server-command "gunicorn backend.wsgi -w 4 -b {host}:{port}"
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlencode
+
+import numpy as np
+from dotenv import dotenv_values
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+DEFAULT_SERVER_COMMAND = "{python} manage.py runserver --noreload {host}:{port}"
+
+# Greece, roughly
+LATITUDES = (34.5, 41.5)
+LONGITUDES = (19.5, 28.5)
+
+
+def synthetic_event(rng, time):
+    return {
+        "time": time,
+        "latitude": round(rng.uniform(*LATITUDES), 2),
+        "longitude": round(rng.uniform(*LONGITUDES), 2),
+        "depth": round(rng.uniform(0, 150), 1),
+        "magnitude": round(0.8 + rng.expovariate(1.2), 1),
+    }
+
+
+class SyntheticFeed:
+    """
+    Generates earthquakes at `rate` per second from the moment it is created.
+    Like the real feed, the XML only lists the earthquakes of the last `window` seconds.
+    """
+
+    def __init__(self, rate, window=3600, seed=0):
+        self.rate = rate
+        self.window = window
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.start_time = datetime.now(timezone.utc).replace(microsecond=0)
+        self.events = []
+
+    def generate(self):
+        with self.lock:
+            expected = int((time.monotonic() - self.started) * self.rate)
+            while len(self.events) < expected:
+                at = self.start_time + timedelta(seconds=len(self.events) / self.rate)
+                self.events.append(synthetic_event(self.rng, at.replace(microsecond=0)))
+            return list(self.events)
+
+    def xml(self):
+        since = datetime.now(timezone.utc) - timedelta(seconds=self.window)
+        items = "".join(
+            "<item><description>"
+            f"M {event['magnitude']}&lt;br&gt;"
+            f"Time: {event['time'].strftime('%d-%b-%Y %H:%M:%S')}&lt;br&gt;"
+            f"Latitude: {event['latitude']}N&lt;br&gt;"
+            f"Longitude: {event['longitude']}E&lt;br&gt;"
+            f"Depth: {event['depth']}km"
+            "</description></item>"
+            for event in self.generate() if event["time"] >= since
+        )
+        return f'<?xml version="1.0"?><rss><channel>{items}</channel></rss>'.encode()
+
+
+def start_feed_server(feed, host):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = feed.xml()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/xml")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}/seismicity.xml"
+
+
+def free_port(host):
+    with socket.socket() as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+def summarize(latencies, errors, duration):
+    """
+    Latency percentiles (ms), throughput (requests/s) and error rate of one endpoint.
+    """
+    requests = len(latencies) + errors
+    summary = {
+        "requests": requests,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        "throughput": round(requests / duration, 2) if duration else 0.0,
+        "latency_ms": None,
+    }
+    if latencies:
+        values = np.asarray(latencies) * 1000
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        summary["latency_ms"] = {
+            "p50": round(float(p50), 2),
+            "p95": round(float(p95), 2),
+            "p99": round(float(p99), 2),
+            "mean": round(float(values.mean()), 2),
+            "max": round(float(values.max()), 2),
+        }
+    return summary
+
+
+def random_range(rng, days):
+    end = datetime.now(timezone.utc).date() - timedelta(days=rng.randint(0, days))
+    start = end - timedelta(days=rng.randint(0, 60))
+    return {"min_date": start.isoformat(), "max_date": end.isoformat()}
+
+
+# Request mix: (name, weight, builder returning the path and query parameters)
+REQUEST_MIX = [
+    ("list_last_24h", 35, lambda rng, days: ("/earthquakes/", {})),
+    ("stats_last_24h", 35, lambda rng, days: ("/earthquakes/stats/", {})),
+    ("list_date_range", 10, lambda rng, days: ("/earthquakes/", random_range(rng, days))),
+    ("stats_date_range", 10, lambda rng, days: ("/earthquakes/stats/", random_range(rng, days))),
+    ("list_filtered", 5, lambda rng, days: ("/earthquakes/", {
+        "min_magnitude": rng.choice(["2", "3", "4"]),
+        "min_latitude": "36", "max_latitude": "40",
+    })),
+    ("list_max_points", 5, lambda rng, days: ("/earthquakes/", {
+        "min_date": (datetime.now(timezone.utc).date() - timedelta(days=days)).isoformat(),
+        "max_date": datetime.now(timezone.utc).date().isoformat(),
+        "max_points": "2000",
+    })),
+]
+
+
+async def http_get(host, port, path, timeout):
+    """
+    Minimal HTTP/1.1 GET over a new connection, returns the status code.
+    """
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+            "Accept: application/json\r\nConnection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+        data = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+    return int(data.split(b" ", 2)[1])
+
+
+async def client(index, args, deadline, results):
+    rng = random.Random(args.seed * 1000 + index)
+    names = [name for name, _, _ in REQUEST_MIX]
+    weights = [weight for _, weight, _ in REQUEST_MIX]
+    builders = {name: build for name, _, build in REQUEST_MIX}
+
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        path, params = builders[name](rng, args.history_days)
+        if params:
+            path = f"{path}?{urlencode(params)}"
+
+        started = time.monotonic()
+        try:
+            status = await http_get(args.host, args.port, path, args.timeout)
+            ok = status < 400
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+            ok = False
+        latency = time.monotonic() - started
+
+        latencies, errors = results.setdefault(name, ([], [0]))
+        if ok:
+            latencies.append(latency)
+        else:
+            errors[0] += 1
+
+        if args.think_time:
+            await asyncio.sleep(rng.uniform(0, 2 * args.think_time))
+
+
+async def run_clients(args):
+    results = {}
+    deadline = time.monotonic() + args.duration
+    started = time.monotonic()
+    await asyncio.gather(*(client(i, args, deadline, results) for i in range(args.clients)))
+    return results, time.monotonic() - started
+
+
+def ingestion_loop(args, env, feed_url, stop, runs):
+    """
+    Runs fetch_earthquakes against the stand-in feed every fetch_interval seconds,
+    like the scheduled task does in production.
+    """
+    while not stop.is_set():
+        started = time.monotonic()
+        process = subprocess.run(
+            [sys.executable, "manage.py", "fetch_earthquakes", f"--source={feed_url}"],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+        )
+        runs.append({
+            "seconds": time.monotonic() - started,
+            "ok": process.returncode == 0,
+            "added": process.stdout.count("Added:"),
+        })
+        stop.wait(max(0.0, args.fetch_interval - (time.monotonic() - started)))
+
+
+def seed_history(args, count, days):
+    """
+    Fills the database with `count` earthquakes over the last `days` days through the batch API.
+    """
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    url = f"http://{args.host}:{args.port}/earthquakes/batch/"
+    for start in range(0, count, 5000):
+        lines = []
+        for _ in range(min(5000, count - start)):
+            event = synthetic_event(rng, now - timedelta(seconds=rng.uniform(0, days * 86400)))
+            event["time"] = event["time"].replace(microsecond=0).isoformat()
+            lines.append(json.dumps(event))
+        request = urllib.request.Request(
+            url, data="\n".join(lines).encode(), headers={"Content-Type": "application/x-ndjson"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=120) as response:
+            response.read()
+
+
+def wait_for_server(args, process):
+    url = f"http://{args.host}:{args.port}/earthquakes/stats/"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                response.read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not start in time")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the earthquake API while ingestion runs.")
+    parser.add_argument("--clients", type=int, default=20, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=30, help="Test duration in seconds")
+    parser.add_argument("--think-time", type=float, default=0.1, help="Mean pause between requests of a client (s)")
+    parser.add_argument("--timeout", type=float, default=30, help="Request timeout (s)")
+    parser.add_argument("--feed-rate", type=float, default=0.5, help="Synthetic earthquakes per second in the feed")
+    parser.add_argument("--fetch-interval", type=float, default=10, help="Seconds between fetch_earthquakes runs")
+    parser.add_argument("--seed-events", type=int, default=5000, help="Historical earthquakes loaded before the test")
+    parser.add_argument("--history-days", type=int, default=365, help="Days covered by the historical earthquakes")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the feed and clients")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="Server port (0 picks a free one)")
+    parser.add_argument("--server-command", default=DEFAULT_SERVER_COMMAND,
+                        help="Command starting the app, with {python}, {host} and {port} placeholders")
+    parser.add_argument("--startup-timeout", type=float, default=60, help="Seconds to wait for the server")
+    parser.add_argument("--use-configured-db", action="store_true",
+                        help="Use the MySQL server of the .env file instead of a temporary SQLite database")
+    parser.add_argument("--db-name",
+                        help="Database on that server seeded with synthetic data, required with --use-configured-db "
+                             "and must differ from MYSQL_DB_NAME")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    # Never seed synthetic earthquakes into the production database
+    if args.use_configured_db:
+        if not args.db_name:
+            parser.error("--use-configured-db requires --db-name (a database other than MYSQL_DB_NAME)")
+        if args.db_name == configured_db_name():
+            parser.error(f"--db-name {args.db_name} is the configured MYSQL_DB_NAME, use a separate test database")
+    return args
+
+
+def configured_db_name():
+    """
+    MYSQL_DB_NAME as the app sees it: the environment first, then the .env file.
+    """
+    return os.environ.get("MYSQL_DB_NAME") or dotenv_values(BACKEND_DIR / ".env").get("MYSQL_DB_NAME")
+
+
+def database_vendor(env):
+    """
+    Vendor of the database the app uses with this environment ("mysql", "sqlite", ...).
+    settings.py silently falls back to SQLite when MySQL is unreachable.
+    """
+    result = subprocess.run(
+        [sys.executable, "manage.py", "shell", "-c", "from django.db import connection; print(connection.vendor)"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.port = args.port or free_port(args.host)
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ)
+        env.setdefault("DJANGO_SECRET_KEY", "load-test")
+        env.setdefault("CORS_ALLOWED_ORIGINS", "http://localhost:5173")
+        env["DJANGO_ALLOWED_HOSTS"] = f"{args.host},localhost"
+        # The SQLite file is also the fallback if MySQL is unavailable, never the app's own db.sqlite3
+        env["SQLITE_PATH"] = str(Path(directory) / "load_test.sqlite3")
+        if args.use_configured_db:
+            env["USE_SQLITE3"] = "False"
+            env["MYSQL_DB_NAME"] = args.db_name
+        else:
+            env["USE_SQLITE3"] = "True"
+
+        vendor = database_vendor(env)
+        if args.use_configured_db and vendor != "mysql":
+            raise SystemExit(f"--use-configured-db: MySQL is unreachable, the app would use {vendor} instead.")
+
+        subprocess.run([sys.executable, "manage.py", "migrate", "--verbosity", "0"], cwd=BACKEND_DIR, env=env, check=True)
+
+        command = args.server_command.format(python=sys.executable, host=args.host, port=args.port)
+        server_log = open(Path(directory) / "server.log", "w")
+        server = subprocess.Popen(shlex.split(command), cwd=BACKEND_DIR, env=env, stdout=server_log, stderr=subprocess.STDOUT)
+        feed_server = None
+        stop = threading.Event()
+        ingestion = None
+        try:
+            wait_for_server(args, server)
+            if args.seed_events:
+                seed_history(args, args.seed_events, args.history_days)
+
+            feed = SyntheticFeed(args.feed_rate, seed=args.seed)
+            feed_server, feed_url = start_feed_server(feed, args.host)
+            runs = []
+            ingestion = threading.Thread(target=ingestion_loop, args=(args, env, feed_url, stop, runs), daemon=True)
+            ingestion.start()
+
+            results, duration = asyncio.run(run_clients(args))
+        finally:
+            stop.set()
+            if ingestion is not None:
+                ingestion.join()
+            if feed_server is not None:
+                feed_server.shutdown()
+                feed_server.server_close()
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+            server_log.close()
+
+    all_latencies = [latency for latencies, _ in results.values() for latency in latencies]
+    all_errors = sum(errors[0] for _, errors in results.values())
+    report = {
+        "commit": git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "database": vendor,
+        "duration": round(duration, 2),
+        "endpoints": {
+            name: summarize(latencies, errors[0], duration)
+            for name, (latencies, errors) in sorted(results.items())
+        },
+        "total": summarize(all_latencies, all_errors, duration),
+        "ingestion": {
+            "runs": len(runs),
+            "failures": sum(not run["ok"] for run in runs),
+            "added": sum(run["added"] for run in runs),
+            "run_ms": summarize([run["seconds"] for run in runs], 0, duration)["latency_ms"],
+        },
+        "feed": {"events_generated": len(feed.generate())},
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+    return report
+
+
+if __name__ == "__main__":
+    main()